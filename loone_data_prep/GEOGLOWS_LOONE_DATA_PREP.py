@@ -8,6 +8,8 @@ import sys
 import os
 import shutil
 from glob import glob
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import pandas as pd
 import numpy as np
 from loone_data_prep.data_analyses_fns import DF_Date_Range
@@ -39,6 +41,57 @@ end_month = END_DATE.strftime("%m")
 end_day = END_DATE.strftime("%d")
 
 
+# Geoglows flow files for each flow column
+# Using geoglows data for S65_total, only data from S65E_S (none from S65EX1_S)
+GEOGLOWS_FLOW_FILES = {
+    "S65_Q": "S65E_S_FLOW_cmd_geoglows.csv",
+    "S71_Q": "S71_S_FLOW_cmd_geoglows.csv",  #'S72_Q': 'S72_S_FLOW_cmd.csv',
+    "S84_Q": "S84_S_FLOW_cmd_geoglows.csv",  #'S127_C_Q': 'S127_C_FLOW_cmd.csv', 'S127_P_Q': 'S127_P_FLOW_cmd.csv',
+    "S129_C_Q": "S129_C_FLOW_cmd_geoglows.csv",
+    "S129_P_Q": "S129 PMP_P_FLOW_cmd_geoglows.csv",
+    "S133_P_Q": "S133_P_FLOW_cmd_geoglows.csv",
+    "S135_C_Q": "S135_C_FLOW_cmd_geoglows.csv",
+    "S135_P_Q": "S135 PMP_P_FLOW_cmd_geoglows.csv",
+    "S154_Q": "S154_C_FLOW_cmd_geoglows.csv",  #'S191_Q': 'S191_S_FLOW_cmd.csv',
+    "S308_Q": "S308.DS_FLOW_cmd_geoglows.csv",
+    "S351_Q": "S351_S_FLOW_cmd_geoglows.csv",
+    "S352_Q": "S352_S_FLOW_cmd_geoglows.csv",
+    "S354_Q": "S354_S_FLOW_cmd_geoglows.csv",
+    "FISHP_Q": "FISHP_FLOW_cmd_geoglows.csv",  #'L8_Q': 'L8.441_FLOW_cmd_geoglows.csv',
+    "S2_P_Q": "S2_P_FLOW_cmd_geoglows.csv",
+    "S3_P_Q": "S3_P_FLOW_cmd_geoglows.csv",  #'S4_P_Q': 'S4_P_FLOW_cmd.csv',
+    "S77_Q": "S77_S_FLOW_cmd_geoglows.csv",
+    "INDUST_Q": "INDUST_FLOW_cmd_geoglows.csv",
+}
+
+# Flow columns summed up into the total inflows
+INFLOW_COLUMNS = (
+    "S65_Q",
+    "S71_Q",  #'S72_Q',
+    "S84_Q",  #'S127_In',
+    "S129_In",
+    "S133_P_Q",
+    "S135_In",
+    "S154_Q",  #'S191_Q',
+    "S308_In",
+    "S77_In",
+    "S351_In",
+    "S352_In",
+    "S354_In",  #'L8_In',
+    "FISHP_Q",
+    "S2_P_Q",
+    "S3_P_Q",
+    # 'S4_P_Q',
+)
+
+# Flow columns summed up into the total outflows
+# OUTFLOW_COLUMNS = ("S308_Out", "S77_Out", 'S351_Out', 'S352_Out', 'S354_Out', 'INDUST_Out', 'L8_Out')
+OUTFLOW_COLUMNS = ("S308_Out", "S77_Out", "S351_Out", "S352_Out", "S354_Out", "INDUST_Out")
+
+# Cubic meters in an acre-foot
+M3_PER_ACFT = 1233.48
+
+
 def main(input_dir: str, output_dir: str, ensemble_number: str) -> None:  # , historical_files_src: str) -> None:
     # To create File (Average_LO_Storage)
     # Read LO Average Stage (ft)
@@ -57,36 +110,20 @@ def main(input_dir: str, output_dir: str, ensemble_number: str) -> None:  # , hi
     LO_Stg_Sto_SA_df["Stage_ft"] = LO_Stage["Average_Stage"]
     LO_Stg_Sto_SA_df["Stage_m"] = LO_Stg_Sto_SA_df["Stage_ft"].values * 0.3048  # ft to m
     LO_Stg_Sto_SA_df["Storage_acft"] = LO_Storage
-    LO_Stg_Sto_SA_df["Storage_cmd"] = LO_Stg_Sto_SA_df["Storage_acft"] * 1233.48  # acft to m3/d
+    LO_Stg_Sto_SA_df["Storage_cmd"] = LO_Stg_Sto_SA_df["Storage_acft"] * M3_PER_ACFT  # acft to m3/d
     LO_Stg_Sto_SA_df["SA_acres"] = LO_SA  # acres
 
-    # Using geoglows data for S65_total, only data from S65E_S (none from S65EX1_S)
-    S65_total = pd.read_csv(f"{input_dir}/S65E_S_FLOW_cmd_geoglows.csv")
-
-    S71_S = pd.read_csv(f"{input_dir}/S71_S_FLOW_cmd_geoglows.csv")
-    # S72_S = pd.read_csv(f'{input_dir}/S72_S_FLOW_cmd.csv')
-    S84_S = pd.read_csv(f"{input_dir}/S84_S_FLOW_cmd_geoglows.csv")
-    # S127_C = pd.read_csv(f'{input_dir}/S127_C_FLOW_cmd.csv')
-    # S127_P = pd.read_csv(f'{input_dir}/S127_P_FLOW_cmd.csv')
-    S129_C = pd.read_csv(f"{input_dir}/S129_C_FLOW_cmd_geoglows.csv")
-    S129_P = pd.read_csv(f"{input_dir}/S129 PMP_P_FLOW_cmd_geoglows.csv")
-    S133_P = pd.read_csv(f"{input_dir}/S133_P_FLOW_cmd_geoglows.csv")
-    S135_C = pd.read_csv(f"{input_dir}/S135_C_FLOW_cmd_geoglows.csv")
-    S135_P = pd.read_csv(f"{input_dir}/S135 PMP_P_FLOW_cmd_geoglows.csv")
-    S154_C = pd.read_csv(f"{input_dir}/S154_C_FLOW_cmd_geoglows.csv")
-    # S191_S = pd.read_csv(f'{input_dir}/S191_S_FLOW_cmd.csv')
-    S308 = pd.read_csv(f"{input_dir}/S308.DS_FLOW_cmd_geoglows.csv")
-    S351_S = pd.read_csv(f"{input_dir}/S351_S_FLOW_cmd_geoglows.csv")
-    S352_S = pd.read_csv(f"{input_dir}/S352_S_FLOW_cmd_geoglows.csv")
-    S354_S = pd.read_csv(f"{input_dir}/S354_S_FLOW_cmd_geoglows.csv")
-    FISHP = pd.read_csv(f"{input_dir}/FISHP_FLOW_cmd_geoglows.csv")
-    # L8 = pd.read_csv(f'{input_dir}/L8.441_FLOW_cmd_geoglows.csv')
-    S2_P = pd.read_csv(f"{input_dir}/S2_P_FLOW_cmd_geoglows.csv")
-    S3_P = pd.read_csv(f"{input_dir}/S3_P_FLOW_cmd_geoglows.csv")
-    # S4_P = pd.read_csv(f'{input_dir}/S4_P_FLOW_cmd.csv')
-
-    S77_S = pd.read_csv(f"{input_dir}/S77_S_FLOW_cmd_geoglows.csv")
-    INDUST = pd.read_csv(f"{input_dir}/INDUST_FLOW_cmd_geoglows.csv")
+    # Name of the column holding this ensemble's flows in the geoglows flow files
+    ensemble_column = f"ensemble_{ensemble_number}_m^3/d"
+
+    # Read flow data cubic meters per day (only the date and ensemble columns are kept)
+    # The files are independent of each other, so they are read concurrently. Whole files are parsed and cached (until
+    # they change), so running main() for each ensemble only parses every file once instead of once per ensemble.
+    def _read_flow_file(file_name: str) -> pd.DataFrame:
+        return _read_csv_cached(f"{input_dir}/{file_name}")[["date", ensemble_column]].copy()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        Q_list = dict(zip(GEOGLOWS_FLOW_FILES.keys(), executor.map(_read_flow_file, GEOGLOWS_FLOW_FILES.values())))
 
     # Read Interpolated TP data
     # Data_Interpolation Python Script is used to interpolate TP data for all inflow stations addressed below!
@@ -109,47 +146,6 @@ def main(input_dir: str, output_dir: str, ensemble_number: str) -> None:  # , hi
     # Set date range for S65 TP
     S65_total_TP = DF_Date_Range(S65_total_TP, M3_Yr, M3_M, M3_D, En_Yr, En_M, En_D)
 
-    # Set Date Range
-    Q_names = [
-        "S65_Q",
-        "S71_Q",  #'S72_Q',
-        "S84_Q",  #'S127_C_Q', 'S127_P_Q',
-        "S129_C_Q",
-        "S129_P_Q",
-        "S133_P_Q",
-        "S135_C_Q",
-        "S135_P_Q",
-        "S154_Q",  #'S191_Q',
-        "S308_Q",
-        "S351_Q",
-        "S352_Q",
-        "S354_Q",
-        "FISHP_Q",  #'L8_Q',
-        "S2_P_Q",
-        "S3_P_Q",  #'S4_P_Q',
-        "S77_Q",
-        "INDUST_Q",
-    ]
-    Q_list = {
-        "S65_Q": S65_total,
-        "S71_Q": S71_S,
-        "S84_Q": S84_S,
-        "S129_C_Q": S129_C,
-        "S129_P_Q": S129_P,
-        "S133_P_Q": S133_P,
-        "S135_C_Q": S135_C,
-        "S135_P_Q": S135_P,
-        "S154_Q": S154_C,
-        "S308_Q": S308,
-        "S351_Q": S351_S,
-        "S352_Q": S352_S,
-        "S354_Q": S354_S,
-        "FISHP_Q": FISHP,  #'L8_Q': L8,
-        "S2_P_Q": S2_P,
-        "S3_P_Q": S3_P,
-        "S77_Q": S77_S,
-        "INDUST_Q": INDUST,
-    }
     # Identify date range
     date = pd.date_range(start=f"{st_month}/{st_day}/{st_year}", end=f"{end_month}/{end_day}/{end_year}", freq="D")
     historical_date = pd.date_range(start=f"{M3_M}/{M3_D}/{M3_Yr}", end=f"{En_M}/{En_D}/{En_Yr}", freq="D")
@@ -167,11 +163,12 @@ def main(input_dir: str, output_dir: str, ensemble_number: str) -> None:  # , hi
 
     geoglows_flow_df = pd.DataFrame(date, columns=["date"])
 
-    for i in range(len(Q_names)):
-        x = DF_Date_Range(Q_list[Q_names[i]], st_year, st_month, st_day, end_year, end_month, end_day)
-        for column_name in x.columns:
-            if ensemble_number in column_name:
-                geoglows_flow_df[Q_names[i]] = x[column_name]
+    # Collect the ensemble column of each flow and add them to the flow dataframe at once
+    Q_columns = {}
+    for Q_name, Q_data in Q_list.items():
+        x = DF_Date_Range(Q_data, st_year, st_month, st_day, end_year, end_month, end_day)
+        Q_columns[Q_name] = x[ensemble_column]
+    geoglows_flow_df = geoglows_flow_df.join(pd.DataFrame(Q_columns))
 
     _create_flow_inflow_cqpq(geoglows_flow_df, ensemble_number, "S129_C_Q", "S129_P_Q", "S129_In")
     _create_flow_inflow_cqpq(geoglows_flow_df, ensemble_number, "S135_C_Q", "S135_P_Q", "S135_In")
@@ -191,32 +188,10 @@ def main(input_dir: str, output_dir: str, ensemble_number: str) -> None:  # , hi
     _create_flow_outflow_q(geoglows_flow_df, ensemble_number, "S354_Q", "S354_Out")
     # _create_flow_outflow_q(geoglows_flow_df, ensemble_number, 'L8_Q', 'L8_Out')
 
-    geoglows_flow_df["Inflows"] = geoglows_flow_df[
-        [
-            "S65_Q",
-            "S71_Q",  #'S72_Q',
-            "S84_Q",  #'S127_In',
-            "S129_In",
-            "S133_P_Q",
-            "S135_In",
-            "S154_Q",  #'S191_Q',
-            "S308_In",
-            "S77_In",
-            "S351_In",
-            "S352_In",
-            "S354_In",  #'L8_In',
-            "FISHP_Q",
-            "S2_P_Q",
-            "S3_P_Q",
-        ]
-    ].sum(
-        axis=1
-    )  # , 'S4_P_Q']].sum(axis=1)
+    # Sum the inflows row-wise in NumPy (missing values count as 0, like DataFrame.sum)
+    geoglows_flow_df["Inflows"] = np.nansum(_stack_columns(geoglows_flow_df, INFLOW_COLUMNS), axis=1)
     geoglows_flow_df["Netflows"] = geoglows_flow_df["Inflows"] - geoglows_flow_df["INDUST_Out"]
-    # flow_filter_cols = ["S308_Out", "S77_Out", 'S351_Out', 'S352_Out', 'S354_Out', 'INDUST_Out', 'L8_Out']
-    flow_filter_cols = ["S308_Out", "S77_Out", "S351_Out", "S352_Out", "S354_Out", "INDUST_Out"]
-
-    geoglows_flow_df["Outflows"] = geoglows_flow_df[flow_filter_cols].sum(axis=1)
+    geoglows_flow_df["Outflows"] = np.nansum(_stack_columns(geoglows_flow_df, OUTFLOW_COLUMNS), axis=1)
     TP_names = [
         "S65_TP",
         "S71_TP",  #'S72_TP',
@@ -258,7 +233,7 @@ def main(input_dir: str, output_dir: str, ensemble_number: str) -> None:  # , hi
 
     # Create File (Outflows_consd_20082023)
     Outflows_consd = pd.DataFrame(geoglows_flow_df["date"], columns=["date"])
-    Outflows_consd["Outflows_acft"] = geoglows_flow_df["Outflows"] / 1233.48  # acft
+    Outflows_consd["Outflows_acft"] = geoglows_flow_df["Outflows"] / M3_PER_ACFT  # acft
 
     # Create File (INDUST_Outflow_20082023)
     INDUST_Outflows = pd.DataFrame(geoglows_flow_df["date"], columns=["date"])
@@ -267,7 +242,7 @@ def main(input_dir: str, output_dir: str, ensemble_number: str) -> None:  # , hi
     # Create File (Netflows_acft)
     # This is also Column (Net Inflow) in File (SFWMM_Daily_Outputs)
     Netflows = pd.DataFrame(geoglows_flow_df["date"], columns=["date"])
-    Netflows["Netflows_acft"] = geoglows_flow_df["Netflows"] / 1233.48  # acft
+    Netflows["Netflows_acft"] = geoglows_flow_df["Netflows"] / M3_PER_ACFT  # acft
 
     # Create File (TotalQWCA_Obs)
     # This is also Column (RegWCA) in File (SFWMM_Daily_Outputs)
@@ -588,6 +563,39 @@ def main(input_dir: str, output_dir: str, ensemble_number: str) -> None:  # , hi
     INDUST_Outflows.to_csv(f"{output_dir}/INDUST_Outflows.csv", index=False)
 
 
+def _stack_columns(df: pd.DataFrame, columns: tuple) -> np.ndarray:
+    """Stacks the given columns of the DataFrame into a row-major (C-contiguous) 2D array, one column per column name.
+    Row-wise reductions over the result read memory linearly instead of striding across the DataFrame's column blocks.
+
+    Args:
+        df (pd.DataFrame): The DataFrame holding the columns.
+        columns (tuple): The names of the columns to stack.
+
+    Returns:
+        np.ndarray: The stacked values, with shape (len(df), len(columns)).
+    """
+    return np.stack([df[column].to_numpy() for column in columns], axis=1)
+
+
+def _read_csv_cached(path: str) -> pd.DataFrame:
+    """Reads the given .csv file, reusing the parsed data if the file hasn't changed since it was last read.
+
+    Args:
+        path (str): The path to the .csv file.
+
+    Returns:
+        pd.DataFrame: The parsed data. Shared between calls, so it must not be modified.
+    """
+    return _read_csv_modified(path, os.path.getmtime(path))
+
+
+# Sized to hold each flow file once, so at most one parsed copy of the flow files is kept
+@lru_cache(maxsize=len(GEOGLOWS_FLOW_FILES))
+def _read_csv_modified(path: str, modified_time: float) -> pd.DataFrame:
+    # The modification time is only part of the cache key
+    return pd.read_csv(path)
+
+
 def _create_flow_inflow_cqpq(
     df: pd.DataFrame, ensemble_number: str, column_cq: str, column_pq: str, column_sum_name: str
 ):
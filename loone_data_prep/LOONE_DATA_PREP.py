@@ -109,13 +109,16 @@ def main(input_dir: str, output_dir: str) -> None:
     date = pd.date_range(start=f'{M3_M}/{M3_D}/{M3_Yr}', end=f'{En_M}/{En_D}/{En_Yr}', freq='D')
     # Create Flow Dataframe
     Flow_df = pd.DataFrame(date, columns=['date'])
+    # Collect the columns aligned to the date range first, then join them all at once
+    Q_columns = {}
     for i in range(len(Q_names)):
         x = DF_Date_Range(Q_list[Q_names[i]], M3_Yr, M3_M, M3_D, En_Yr, En_M, En_D)
         if len(x.iloc[:, -1:].values) == len(Flow_df['date']):
-            Flow_df[Q_names[i]] = x.iloc[:, -1:].values
+            Q_columns[Q_names[i]] = x.iloc[:, -1].values
         else:
             x.rename(columns={x.columns[-1]: Q_names[i]}, inplace=True)
-            Flow_df = pd.merge(Flow_df, x[['date', Q_names[i]]], on='date', how='left')
+            Q_columns[Q_names[i]] = Flow_df['date'].map(x.drop_duplicates('date').set_index('date')[Q_names[i]]).values
+    Flow_df = Flow_df.join(pd.DataFrame(Q_columns))
 
     Flow_df['S127_C_Q'] = Flow_df['S127_C_Q'][Flow_df['S127_C_Q'] >= 0]
     Flow_df['S127_C_Q'] = Flow_df['S127_C_Q'].fillna(0)
@@ -171,13 +174,16 @@ def main(input_dir: str, output_dir: str) -> None:
                'FISHP_TP': FISHP_TP, 'L8_TP': L8_TP, 'S4_TP': S4_TP}
     # Create TP Concentrations Dataframe
     TP_df = pd.DataFrame(date, columns=['date'])
+    # Collect the columns aligned to the date range first, then join them all at once
+    TP_columns = {}
     for i in range(len(TP_names)):
         y = DF_Date_Range(TP_list[TP_names[i]], M3_Yr, M3_M, M3_D, En_Yr, En_M, En_D)
         if len(y.iloc[:, -1:].values) == len(TP_df['date']):
-            TP_df[TP_names[i]] = y.iloc[:, -1:].values
+            TP_columns[TP_names[i]] = y.iloc[:, -1].values
         else:
             y.rename(columns={y.columns[-1]: TP_names[i]}, inplace=True)
-            TP_df = pd.merge(TP_df, y[['date', TP_names[i]]], on='date', how='left')
+            TP_columns[TP_names[i]] = TP_df['date'].map(y.drop_duplicates('date').set_index('date')[TP_names[i]]).values
+    TP_df = TP_df.join(pd.DataFrame(TP_columns))
 
     # Determine TP Loads (mg)
     TP_Loads_In = pd.DataFrame(date, columns=['date'])
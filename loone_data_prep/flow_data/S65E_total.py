@@ -1,25 +1,28 @@
 import sys
+import time
+from functools import lru_cache
 from retry import retry
-from rpy2.robjects import r
+import rpy2.robjects as ro
+from rpy2.robjects import r, pandas2ri
 from rpy2.rinterface_lib.embedded import RRuntimeError
 import pandas as pd
+from loone_data_prep.utils import parse_dbhydro_dates
 
 
-@retry(RRuntimeError, tries=5, delay=15, max_delay=60, backoff=2)
-def get(
-    workspace, 
-    date_min: str = "1972-01-01", 
-    date_max: str = "2023-06-30"
-) -> None:
+@lru_cache(maxsize=1)
+def _define_r_retrieve_data() -> None:
+    """Defines the R retrieve_data() function used by _retrieve_data().
+    The definition (and loading of the R libraries) only needs to happen once per R session, so it is cached.
+    """
     r(
-        f"""
+        """
         # Load the required libraries
         library(dbhydroR)
         library(dplyr)
         
         # Helper Functions
         retrieve_data <- function(dbkey, date_min, date_max) 
-        {{
+        {
             # Get the data from dbhydro
             df = get_hydro(dbkey = dbkey, date_min = date_min, date_max = date_max, raw = TRUE)
         
@@ -41,49 +44,86 @@ def get(
             
             # Return resulting data.frame
             return(df)
-        }}
-        
-        # S65E_S
-        S65E_S <- retrieve_data(dbkey = "91656", date_min = "{date_min}", date_max = "{date_max}")
-        
-        # Wait five seconds before next request to avoid "too many requests" error
-        Sys.sleep(5)
-        
-        # S65EX1_S
-        S65EX1_S <- retrieve_data(dbkey = "AL760", date_min = "{date_min}", date_max = "{date_max}")
-        
-        # Merge the data from each dbkey
-        result <- merge(S65E_S, S65EX1_S, by = "date", all = TRUE)
-        
-        # Write the data to a file
-        write.csv(result, file = '{workspace}/S65E_total.csv')
+        }
         """
     )
-    
-    _reformat_s65e_total_file(workspace)
 
-def _reformat_s65e_total_file(workspace: str):
-    # Read in the data
-    df = pd.read_csv(f"{workspace}/S65E_total.csv")
+
+@retry(RRuntimeError, tries=5, delay=15, max_delay=60, backoff=2)
+def get(
+    workspace, 
+    date_min: str = "1972-01-01", 
+    date_max: str = "2023-06-30"
+) -> None:
+    # Define the R retrieve_data function (only done once per session)
+    _define_r_retrieve_data()
     
-    # Drop unused columns
-    df.drop('Unnamed: 0', axis=1, inplace=True)
+    # S65E_S
+    df_s65e_s = _retrieve_data("91656", date_min, date_max)
     
-    # Convert date column to datetime
-    df['date'] = pd.to_datetime(df['date'], format='%d-%b-%Y')
+    # Wait five seconds before next request to avoid "too many requests" error
+    time.sleep(5)
     
-    # Sort the data by date
-    df.sort_values('date', inplace=True)
+    # S65EX1_S
+    df_s65ex1_s = _retrieve_data("AL760", date_min, date_max)
     
-    # Renumber the index
-    df.reset_index(drop=True, inplace=True)
+    # Merge the data from each dbkey by aligning their sorted dates
+    df = _set_date_index(df_s65e_s).join(_set_date_index(df_s65ex1_s), how="outer")
     
-    # Drop rows that are missing all their values
-    df.dropna(how='all', inplace=True)
+    # Reformat the merged data in memory
+    df = _reformat_s65e_total_df(df)
     
-    # Write the updated data back to the file
+    # Write the data to a file
     df.to_csv(f"{workspace}/S65E_total.csv")
 
+def _retrieve_data(dbkey: str, date_min: str, date_max: str) -> pd.DataFrame:
+    """Gets the cleaned flow data (m³/day) for the given dbkey using the R retrieve_data function.
+
+    Args:
+        dbkey (str): The dbkey to get the flow data for.
+        date_min (str): The start date of the data to get (YYYY-MM-DD).
+        date_max (str): The end date of the data to get (YYYY-MM-DD).
+
+    Returns:
+        pd.DataFrame: The flow data with a "date" column and a "<station>_FLOW_cfs" column.
+    """
+    # Get the data from R
+    r_dataframe = r.retrieve_data(dbkey, date_min, date_max)
+    
+    # Convert the r dataframe to a pandas dataframe
+    with (ro.default_converter + pandas2ri.converter).context():
+        return ro.conversion.get_conversion().rpy2py(r_dataframe)
+
+def _set_date_index(df: pd.DataFrame) -> pd.DataFrame:
+    """Converts the "date" column of the given data to a sorted DatetimeIndex.
+
+    Args:
+        df (pd.DataFrame): The data with a "date" column in DD-Mon-YYYY format.
+
+    Returns:
+        pd.DataFrame: The data indexed and sorted by date.
+    """
+    # Convert date column to datetime
+    df['date'] = parse_dbhydro_dates(df['date'])
+    
+    # Index and sort the data by date
+    return df.set_index('date').sort_index(kind='mergesort')
+
+def _reformat_s65e_total_df(df: pd.DataFrame) -> pd.DataFrame:
+    """Reformats the merged S65E_S and S65EX1_S data: drops empty rows and moves the dates back into a column.
+
+    Args:
+        df (pd.DataFrame): The merged data indexed and sorted by date.
+
+    Returns:
+        pd.DataFrame: The reformatted data.
+    """
+    # Drop rows that are missing all their values
+    df = df.dropna(how='all')
+    
+    # Move the dates back into a column and renumber the index (the joined data is already sorted by date)
+    return df.reset_index()
+
 if __name__ == "__main__":
     workspace = sys.argv[1].rstrip("/")
     get(workspace)
@@ -4,6 +4,7 @@ import math
 import numpy as np
 import pandas as pd
 import geoglows
+from functools import lru_cache
 from scipy import interpolate
 
 
@@ -18,16 +19,10 @@ def get_bias_corrected_data(
     station_stats: pd.DataFrame,
     cache_path: str = None,
 ) -> dict:
-    # Load the observed data from a CSV file
-    observed_data = pd.read_csv(
-        observed_data_path,
-        index_col=0,
-        usecols=["date", f"{station_id}_FLOW_cmd"],
-    )
-    # Convert the index to datetime and localize it to UTC
-    observed_data.index = pd.to_datetime(observed_data.index).tz_localize(
-        "UTC"
-    )
+    # Load the observed data from a CSV file (parsed files are cached by path and modification time)
+    observed_data = _read_observed_data(
+        observed_data_path, station_id, os.path.getmtime(observed_data_path)
+    ).copy()
     # Transform the data by dividing it by the number of seconds in a day
     observed_data = observed_data.transform(lambda x: x / SECONDS_IN_DAY)
     # Rename the value column to "Streamflow (m3/s)"
@@ -38,7 +33,66 @@ def get_bias_corrected_data(
     # Prepare the observed data by filling NaN values with the 10yr average
     prepared_od = prep_observed_data(observed_data)
 
-    # Get the historical simulation data for the given reach ID
+    # Get the historical simulation data for the given reach ID (cached per reach ID)
+    historical_data = _get_historic_simulation(reach_id, cache_path).copy()
+
+    # Correct the forecast bias in the station ensembles
+    station_ensembles = bias_correct_forecast(
+        station_ensembles, historical_data, prepared_od
+    )
+    # Correct the forecast bias in the station stats
+    station_stats = bias_correct_forecast(
+        station_stats, historical_data, prepared_od
+    )
+
+    # Return the bias-corrected station ensembles and station stats
+    return station_ensembles, station_stats
+
+
+@lru_cache(maxsize=64)
+def _read_observed_data(
+    observed_data_path: str, station_id: str, modified_time: float
+) -> pd.DataFrame:
+    """Reads the observed flow data of the given station. Results are cached,
+        so treat the returned DataFrame as read-only.
+
+    Args:
+        observed_data_path (str): The path to the observed flow data .csv file.
+        station_id (str): The id of the station the data is for.
+        modified_time (float): The modification time of the file. Part of the
+            cache key so changed files get read again.
+
+    Returns:
+        pd.DataFrame: The observed flow data (m^3/d) with a UTC DatetimeIndex.
+    """
+    # Load the observed data from a CSV file (dates are parsed while reading)
+    observed_data = pd.read_csv(
+        observed_data_path,
+        index_col="date",
+        usecols=["date", f"{station_id}_FLOW_cmd"],
+        parse_dates=["date"],
+    )
+    # Localize the index to UTC
+    observed_data.index = observed_data.index.tz_localize("UTC")
+
+    return observed_data
+
+
+@lru_cache(maxsize=64)
+def _get_historic_simulation(
+    reach_id: str, cache_path: str = None
+) -> pd.DataFrame:
+    """Gets the geoglows historical simulation data for the given reach ID.
+        Results are cached, so treat the returned DataFrame as read-only.
+
+    Args:
+        reach_id (str): The reach ID to get the historical simulation for.
+        cache_path (str): The path to the cache directory for geoglows data.
+            Use None to not use a cache on disk.
+
+    Returns:
+        pd.DataFrame: The historical simulation data.
+    """
     historical_data = None
 
     if cache_path is None:
@@ -70,17 +124,7 @@ def get_bias_corrected_data(
                 )
             )
 
-    # Correct the forecast bias in the station ensembles
-    station_ensembles = bias_correct_forecast(
-        station_ensembles, historical_data, prepared_od
-    )
-    # Correct the forecast bias in the station stats
-    station_stats = bias_correct_forecast(
-        station_stats, historical_data, prepared_od
-    )
-
-    # Return the bias-corrected station ensembles and station stats
-    return station_ensembles, station_stats
+    return historical_data
 
 
 def prep_observed_data(observed_data: pd.DataFrame) -> pd.DataFrame:
@@ -281,13 +325,30 @@ if __name__ == "__main__":
     station_id = sys.argv[1]
     reach_id = sys.argv[2]
     observed_data_path = sys.argv[3].rstrip("/")
-    station_ensembles = sys.argv[4]
-    station_stats = sys.argv[5]
+    station_ensembles_path = sys.argv[4]
+    station_stats_path = sys.argv[5]
+    cache_path = sys.argv[6].rstrip("/") if len(sys.argv) >= 7 else None
+
+    # Load the geoglows ensembles and stats (indexed by datetime)
+    station_ensembles = pd.read_csv(
+        station_ensembles_path, index_col=0, parse_dates=True
+    )
+    station_stats = pd.read_csv(
+        station_stats_path, index_col=0, parse_dates=True
+    )
 
-    get_bias_corrected_data(
+    station_ensembles, station_stats = get_bias_corrected_data(
         station_id,
         reach_id,
         observed_data_path,
         station_ensembles,
         station_stats,
+        cache_path,
     )
+
+    # Write out the bias corrected data next to the given files
+    for path, data in [
+        (station_ensembles_path, station_ensembles),
+        (station_stats_path, station_stats),
+    ]:
+        data.to_csv(f"{os.path.splitext(path)[0]}_bias_corrected.csv")
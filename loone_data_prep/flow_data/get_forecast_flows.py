@@ -1,11 +1,17 @@
 import os
 import sys
 import glob
+import json
+import numpy as np
 import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
 import rpy2.robjects as ro
 from rpy2.robjects import pandas2ri
 import geoglows
 import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 from loone_data_prep.utils import get_dbkeys
 from loone_data_prep.flow_data.forecast_bias_correction import (
     get_bias_corrected_data,
@@ -84,6 +90,16 @@ FORECAST_DATE = (datetime.datetime.now()).strftime("%Y%m%d")
 
 GEOGLOWS_ENDPOINT = "https://geoglows.ecmwf.int/api/"
 
+# Maximum number of stations whose forecasts are downloaded at the same time
+MAX_DOWNLOAD_WORKERS = 16
+
+# Session shared by all geoglows forecast requests so connections are kept alive and pooled across the download threads
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=MAX_DOWNLOAD_WORKERS, pool_maxsize=2 * MAX_DOWNLOAD_WORKERS))
+
+# Name of the file in the workspace that caches the reach ids looked up by latitude/longitude
+REACH_ID_CACHE_FILE_NAME = "_reach_id_cache.json"
+
 
 def get_stations_latitude_longitude(station_ids: list[str]):
     """Gets the latitudes and longitudes of the given stations.
@@ -99,12 +115,28 @@ def get_stations_latitude_longitude(station_ids: list[str]):
     If a station's latitude/longitude fails to download then its station_id
         won't be a key in the returned dictionary.
     """
+    # Station metadata doesn't change during a run, so lookups are cached by the set of station ids
+    return dict(_get_stations_latitude_longitude(tuple(sorted(set(station_ids)))))
+
+
+@lru_cache(maxsize=128)
+def _get_stations_latitude_longitude(station_ids: tuple[str, ...]):
+    """Cached helper for get_stations_latitude_longitude().
+
+    Args:
+        station_ids (tuple[str, ...]): The sorted, unique ids of the stations
+            to get the latitudes/longitudes of
+
+    Returns:
+        (dict[str, tuple[numpy.float64, numpy.float64]]): A dictionary of
+            format dict<station_id:(latitude,longitude)>
+    """
     # The dict that holds the data that gets returned
     station_data = {}
 
     # Get the station/dbkey data
     r_dataframe = get_dbkeys(
-        station_ids=station_ids,
+        station_ids=list(station_ids),
         category="SW",
         param="",
         stat="",
@@ -112,13 +144,20 @@ def get_stations_latitude_longitude(station_ids: list[str]):
         detail_level="full",
     )
 
+    # Keep only the first row of each station and the columns that are used, so only those get converted to pandas
+    r_dataframe = ro.r(
+        """
+        function(dbkeys)
+        {
+            dbkeys[!duplicated(dbkeys$Station), c("Station", "Latitude", "Longitude")]
+        }
+        """
+    )(r_dataframe)
+
     # Convert the r dataframe to a pandas dataframe
     with (ro.default_converter + pandas2ri.converter).context():
         pd_dataframe = ro.conversion.get_conversion().rpy2py(r_dataframe)
 
-    # Filter out extra rows for each station from the dataframe
-    pd_dataframe.drop_duplicates(subset="Station", keep="first", inplace=True)
-
     # Get latitude/longitude of each station
     for index in pd_dataframe.index:
         station = pd_dataframe["Station"][index]
@@ -130,8 +169,10 @@ def get_stations_latitude_longitude(station_ids: list[str]):
     return station_data
 
 
+@lru_cache(maxsize=256)
 def get_reach_id(latitude: float, longitude: float):
     """Gets the reach id for the given latitude/longitude.
+        Results are cached for the rest of the run.
 
     Args:
         latitude (float): The latitude to retrieve the reach id of
@@ -160,7 +201,10 @@ def get_flow_forecast_ensembles(reach_id: str, forecast_date: str):
         (pandas.core.frame.DataFrame): The 52 ensemble flow forecasts.
     """
     return geoglows.streamflow.forecast_ensembles(
-        reach_id=reach_id, forecast_date=forecast_date, endpoint=GEOGLOWS_ENDPOINT
+        reach_id=reach_id,
+        forecast_date=forecast_date,
+        endpoint=GEOGLOWS_ENDPOINT,
+        s=_SESSION,
     )
 
 
@@ -177,10 +221,106 @@ def get_flow_forecast_stats(reach_id: str, forecast_date: str):
         (pandas.core.frame.DataFrame): The forecast stats
     """
     return geoglows.streamflow.forecast_stats(
-        reach_id=reach_id, forecast_date=forecast_date, endpoint=GEOGLOWS_ENDPOINT
+        reach_id=reach_id,
+        forecast_date=forecast_date,
+        endpoint=GEOGLOWS_ENDPOINT,
+        s=_SESSION,
     )
 
 
+def _reach_id_cache_key(location: tuple[float, float]) -> str:
+    """Gets the key of the given location in the reach id cache file.
+
+    Args:
+        location (tuple[float, float]): The (latitude, longitude) of a station.
+
+    Returns:
+        (str): The key of format "<latitude>,<longitude>" rounded to 5 decimals.
+    """
+    return f"{round(float(location[0]), 5)},{round(float(location[1]), 5)}"
+
+
+def _read_reach_id_cache(workspace: str) -> dict:
+    """Reads the reach ids cached in the given workspace by previous runs.
+
+    Args:
+        workspace (str): The path to the directory that holds the cache file.
+
+    Returns:
+        (dict[str, int]): The cached reach ids keyed by _reach_id_cache_key().
+            Empty if the cache file doesn't exist or can't be read.
+    """
+    cache_file_path = os.path.join(workspace, REACH_ID_CACHE_FILE_NAME)
+
+    if not os.path.exists(cache_file_path):
+        return {}
+
+    try:
+        with open(cache_file_path, "r") as file:
+            return json.load(file)
+    except (OSError, ValueError) as e:
+        print(f"Error: Failed to read the reach id cache ({str(e)})")
+        return {}
+
+
+def _write_reach_id_cache(workspace: str, reach_id_cache: dict):
+    """Writes the given reach ids to the cache file in the given workspace.
+
+    Args:
+        workspace (str): The path to the directory to write the cache file to.
+        reach_id_cache (dict[str, int]): The reach ids keyed by
+            _reach_id_cache_key().
+    """
+    cache_file_path = os.path.join(workspace, REACH_ID_CACHE_FILE_NAME)
+
+    try:
+        with open(cache_file_path, "w") as file:
+            json.dump(reach_id_cache, file, indent=4, sort_keys=True)
+    except OSError as e:
+        print(f"Error: Failed to write the reach id cache ({str(e)})")
+
+
+def _fetch_station_forecast(
+    station_id: str,
+    reach_id: int | None,
+    location: tuple[float, float] | None,
+    forecast_date: str,
+):
+    """Downloads the forecast ensembles and stats of a single station.
+        Meant to be used as a helper function in main().
+
+    Args:
+        station_id (str): The id of the station (only used in messages).
+        reach_id (int | None): The reach id of the station. Use None to look
+            it up from the station's location.
+        location (tuple[float, float] | None): The (latitude, longitude) of
+            the station. Only used if reach_id is None.
+        forecast_date (str): A string specifying the date to request in
+            YYYYMMDD format
+
+    Returns:
+        (tuple[int, pandas.core.frame.DataFrame, pandas.core.frame.DataFrame] | None):
+            The reach id, the ensemble forecasts, and the forecast stats.
+            None if the reach id of the station could not be looked up.
+    """
+    # Get the station's reach id (stations whose reach id can't be found are skipped)
+    if reach_id is None:
+        try:
+            reach_id = get_reach_id(location[0], location[1])
+        except Exception as e:
+            print(
+                "Error: Failed to get reach id for station "
+                f"{station_id} ({str(e)})"
+            )
+            return None
+
+    # Get the flow forecasts of the station
+    station_ensembles = get_flow_forecast_ensembles(reach_id, forecast_date)
+    station_stats = get_flow_forecast_stats(reach_id, forecast_date)
+
+    return reach_id, station_ensembles, station_stats
+
+
 def ensembles_to_csv(
     workspace: str,
     station_id: str,
@@ -211,7 +351,7 @@ def ensembles_to_csv(
 
     # Append columns in stats to ensembles
     for column_name in stats.columns:
-        ensembles[column_name] = stats[column_name].tolist()
+        ensembles[column_name] = stats[column_name].to_numpy()
 
     # Write out the .csv file
     ensembles.to_csv(file_path)
@@ -220,6 +360,42 @@ def ensembles_to_csv(
     print(f"File Saved: {file_path}")
 
 
+def _prepare_forecast_DataFrame(
+    dataframe: pd.core.frame.DataFrame, high_res_column: str
+):
+    """Does the preparation shared by _format_ensembles_DataFrame() and
+        _format_stats_DataFrame() in a single pass over the values.
+        The given DataFrame is not modified.
+
+    Args:
+        dataframe (pandas.core.frame.DataFrame): The ensembles or stats
+            retrieved from geoglows (m^3/s).
+        high_res_column (str): The name of the high resolution column to
+            remove.
+
+    Returns:
+        (pandas.core.frame.DataFrame): The values in m^3/h with negative values
+            set to 0, rows that had null values removed, and times normalized
+            to 00:00:00+00:00.
+    """
+    # Remove high resolution columns
+    columns = dataframe.columns.drop(high_res_column, errors="ignore")
+    values = dataframe[columns].to_numpy(dtype="float64")
+
+    # Remove rows with null values (boolean indexing copies, so the array can be changed in place from here on)
+    rows = ~np.isnan(values).any(axis=1)
+    values = values[rows]
+
+    # Convert m^3/s data to m^3/h and make negative values 0
+    values *= SECONDS_IN_HOUR
+    np.maximum(values, 0, out=values)
+
+    # Make all times in datetimes 00:00:00+00:00 (ignore time, only use date)
+    index = dataframe.index[rows].normalize()
+
+    return pd.DataFrame(values, index=index, columns=columns)
+
+
 def _format_ensembles_DataFrame(dataframe: pd.core.frame.DataFrame):
     """Formats, modifies, and returns the given pandas DataFrame's data to a
         format that LOONE expects.
@@ -233,35 +409,18 @@ def _format_ensembles_DataFrame(dataframe: pd.core.frame.DataFrame):
         (pandas.core.frame.DataFrame): The resulting formatted/modified pandas
             DataFrame.
     """
-    # Remove high resolution columns (ensemble 52)
-    if "ensemble_52_m^3/s" in dataframe.columns:
-        dataframe.drop(columns="ensemble_52_m^3/s", inplace=True)
-
-    # Remove rows with null values
-    dataframe.dropna(axis="index", inplace=True)
-
-    # Make all times in datetimes 00:00:00+00:00 (ignore time, only use date)
-    dataframe.index = dataframe.index.normalize()
-
-    # Convert m^3/s data to m^3/h
-    dataframe = dataframe.transform(lambda x: x * SECONDS_IN_HOUR)
-
-    # Make negative values 0
-    dataframe.clip(0, inplace=True)
+    # Remove high resolution columns (ensemble 52), drop null rows, and convert to m^3/h
+    dataframe = _prepare_forecast_DataFrame(dataframe, "ensemble_52_m^3/s")
 
     # Get the average m^3/d for each day
     dataframe = dataframe.groupby([dataframe.index]).mean()
-    dataframe = dataframe.transform(lambda x: x * HOURS_IN_DAY)
+    dataframe = dataframe * HOURS_IN_DAY
 
-    # Format datetimes to just dates
-    dataframe.index = dataframe.index.strftime("%Y-%m-%d")
+    # Format datetimes to just dates (geoglows datetimes are in UTC and already normalized to midnight)
+    dataframe.index = dataframe.index.values.astype("datetime64[D]").astype(str)
 
     # Rename columns to *_m^3/d from *_m^3/s
-    column_names = []
-    for column_name in dataframe.columns:
-        column_names.append(column_name.replace("m^3/s", "m^3/d"))
-
-    dataframe.columns = column_names
+    dataframe.columns = dataframe.columns.str.replace("m^3/s", "m^3/d", regex=False)
 
     # Rename index from datetimes to date
     dataframe.rename_axis("date", inplace=True)
@@ -283,75 +442,44 @@ def _format_stats_DataFrame(dataframe: pd.core.frame.DataFrame):
         (pandas.core.frame.DataFrame): The resulting formatted/modified pandas
             DataFrame.
     """
-    # Remove high resolution columns (ensemble 52, high_res_m^3/s)
-    if "high_res_m^3/s" in dataframe.columns:
-        dataframe.drop(columns="high_res_m^3/s", inplace=True)
-
-    # Remove rows with null values
-    dataframe.dropna(axis="index", inplace=True)
-
-    # Make all times in datetimes 00:00:00+00:00 (ignore time, only use date)
-    dataframe.index = dataframe.index.normalize()
-
-    # Convert m^3/s data to m^3/h
-    dataframe = dataframe.transform(lambda x: x * SECONDS_IN_HOUR)
+    # Remove high resolution columns (high_res_m^3/s), drop null rows, and convert to m^3/h
+    dataframe = _prepare_forecast_DataFrame(dataframe, "high_res_m^3/s")
 
-    # Make negative values 0
-    dataframe.clip(0, inplace=True)
+    # Group the rows by date once and reuse the grouping for every column
+    grouped = dataframe.groupby(dataframe.index)
 
     # Max Column (Max)
-    column_max = dataframe[["flow_max_m^3/s"]].copy()
-    column_max = column_max.groupby([column_max.index]).max()
+    column_max = grouped[["flow_max_m^3/s"]].max()
 
     # 75th Percentile Column (Average)
-    column_75percentile = dataframe[["flow_75%_m^3/s"]].copy()
-    column_75percentile = column_75percentile.groupby(
-        [column_75percentile.index]
-    ).mean()
+    column_75percentile = grouped[["flow_75%_m^3/s"]].mean()
 
     # Average Column (Weighted Average)
-    column_average = dataframe[["flow_avg_m^3/s"]].copy()
-    column_average.transform(lambda x: x / 8)
-    column_average = column_average.groupby([column_average.index]).sum()
+    column_average = grouped[["flow_avg_m^3/s"]].sum() / 8
 
     # 25th Percentile Column (Average)
-    column_25percentile = dataframe[["flow_25%_m^3/s"]].copy()
-    column_25percentile = column_25percentile.groupby(
-        [column_25percentile.index]
-    ).mean()
+    column_25percentile = grouped[["flow_25%_m^3/s"]].mean()
 
     # Min Column (Min)
-    column_min = dataframe[["flow_min_m^3/s"]].copy()
-    column_min = column_min.groupby([column_min.index]).min()
+    column_min = grouped[["flow_min_m^3/s"]].min()
 
     # Convert values in each column from m^3/h to m^3/d
-    column_max = column_max.transform(lambda x: x * HOURS_IN_DAY)
-    column_75percentile = column_75percentile.transform(
-        lambda x: x * HOURS_IN_DAY
-    )
-    column_average = column_average.transform(lambda x: x * HOURS_IN_DAY)
-    column_25percentile = column_25percentile.transform(
-        lambda x: x * HOURS_IN_DAY
-    )
-    column_min = column_min.transform(lambda x: x * HOURS_IN_DAY)
-
-    # Append modified columns into one pandas DataFrame
-    dataframe_result = pd.DataFrame()
-    dataframe_result.index = dataframe.groupby([dataframe.index]).mean().index
-    dataframe_result["flow_max_m^3/d"] = column_max["flow_max_m^3/s"].tolist()
-    dataframe_result["flow_75%_m^3/d"] = column_75percentile[
-        "flow_75%_m^3/s"
-    ].tolist()
-    dataframe_result["flow_avg_m^3/d"] = column_average[
-        "flow_avg_m^3/s"
-    ].tolist()
-    dataframe_result["flow_25%_m^3/d"] = column_25percentile[
-        "flow_25%_m^3/s"
-    ].tolist()
-    dataframe_result["flow_min_m^3/d"] = column_min["flow_min_m^3/s"].tolist()
-
-    # Format datetimes to just dates
-    dataframe_result.index = dataframe_result.index.strftime("%Y-%m-%d")
+    column_max = column_max * HOURS_IN_DAY
+    column_75percentile = column_75percentile * HOURS_IN_DAY
+    column_average = column_average * HOURS_IN_DAY
+    column_25percentile = column_25percentile * HOURS_IN_DAY
+    column_min = column_min * HOURS_IN_DAY
+
+    # Append modified columns into one pandas DataFrame (every column shares the grouped dates as its index)
+    dataframe_result = pd.DataFrame(index=column_max.index)
+    dataframe_result["flow_max_m^3/d"] = column_max["flow_max_m^3/s"].to_numpy()
+    dataframe_result["flow_75%_m^3/d"] = column_75percentile["flow_75%_m^3/s"].to_numpy()
+    dataframe_result["flow_avg_m^3/d"] = column_average["flow_avg_m^3/s"].to_numpy()
+    dataframe_result["flow_25%_m^3/d"] = column_25percentile["flow_25%_m^3/s"].to_numpy()
+    dataframe_result["flow_min_m^3/d"] = column_min["flow_min_m^3/s"].to_numpy()
+
+    # Format datetimes to just dates (geoglows datetimes are in UTC and already normalized to midnight)
+    dataframe_result.index = dataframe_result.index.values.astype("datetime64[D]").astype(str)
 
     # Rename index from datetimes to date
     dataframe_result.rename_axis("date", inplace=True)
@@ -386,38 +514,82 @@ def main(
     # Local Variables
     reach_ids = {}
 
-    # Get the latitude/longitude for each station
-    station_locations = get_stations_latitude_longitude(station_ids)
-
-    # Check for any download failures
+    # Use the known reach ids where possible
     for station_id in station_ids:
         if station_id in REACH_IDS.keys():
             reach_ids[station_id] = REACH_IDS[station_id]
-        elif station_id not in station_locations.keys():
+
+    # Get the latitude/longitude of the remaining stations in a single batched lookup
+    unknown_station_ids = [station_id for station_id in station_ids if station_id not in REACH_IDS.keys()]
+    station_locations = get_stations_latitude_longitude(unknown_station_ids) if unknown_station_ids else {}
+
+    # Check for any download failures
+    for station_id in unknown_station_ids:
+        if station_id not in station_locations.keys():
             raise Exception(
                 "Error: The longitude and latitude could not be downloaded "
                 f"for station {station_id}"
             )
 
-    # Get station reach ids
-    if station_id not in REACH_IDS.keys():
-        for station_id in station_locations.keys():
-            location = station_locations[station_id]
+    # Use the reach ids cached by previous runs for the remaining stations
+    reach_id_cache = _read_reach_id_cache(workspace) if unknown_station_ids else {}
+
+    for station_id in unknown_station_ids:
+        cache_key = _reach_id_cache_key(station_locations[station_id])
+        if cache_key in reach_id_cache:
+            reach_ids[station_id] = reach_id_cache[cache_key]
+
+    # Download the reach ids (if unknown) and the forecasts of every station concurrently.
+    # These are independent HTTP requests to geoglows, so threads are enough to overlap them.
+    station_forecasts = {}
+    failed_station_ids = []
+    with ThreadPoolExecutor(max_workers=MAX_DOWNLOAD_WORKERS) as executor:
+        futures = {
+            executor.submit(
+                _fetch_station_forecast,
+                station_id,
+                reach_ids.get(station_id),
+                station_locations.get(station_id),
+                forecast_date,
+            ): station_id
+            for station_id in station_ids
+        }
+
+        for future in as_completed(futures):
+            station_id = futures[future]
             try:
-                reach_ids[station_id] = get_reach_id(location[0], location[1])
+                station_forecast = future.result()
             except Exception as e:
                 print(
-                    "Error: Failed to get reach id for station "
+                    "Error: Failed to get the flow forecast for station "
                     f"{station_id} ({str(e)})"
                 )
+                failed_station_ids.append(station_id)
+                continue
 
-    # Get the flow data for each station
-    for station_id in reach_ids.keys():
-        reach_id = reach_ids[station_id]
-        station_ensembles = get_flow_forecast_ensembles(
-            reach_id, forecast_date
-        )
-        station_stats = get_flow_forecast_stats(reach_id, forecast_date)
+            if station_forecast is not None:
+                station_forecasts[station_id] = station_forecast
+
+    # Cache the reach ids that had to be looked up so later runs can skip the lookups
+    looked_up_station_ids = [
+        station_id
+        for station_id in unknown_station_ids
+        if station_id not in reach_ids and station_id in station_forecasts
+    ]
+
+    if looked_up_station_ids:
+        for station_id in looked_up_station_ids:
+            cache_key = _reach_id_cache_key(station_locations[station_id])
+            reach_id_cache[cache_key] = int(station_forecasts[station_id][0])
+
+        _write_reach_id_cache(workspace, reach_id_cache)
+
+    # Write out the flow data for each station (in the order the stations were given)
+    for station_id in station_ids:
+        if station_id not in station_forecasts:
+            continue
+
+        reach_id, station_ensembles, station_stats = station_forecasts[station_id]
 
         if bias_corrected:
             observed_data_list = glob.glob(
@@ -441,6 +613,13 @@ def main(
             station_stats,
         )
 
+    # Fail if any forecast could not be downloaded, so the files of an older forecast aren't used in its place
+    if failed_station_ids:
+        raise Exception(
+            "Error: Failed to get the flow forecasts for stations "
+            f"{', '.join(sorted(failed_station_ids, key=station_ids.index))}"
+        )
+
 
 if __name__ == "__main__":
     workspace = sys.argv[1].rstrip("/")
@@ -46,8 +46,14 @@ def main(workspace: str, dbkeys: dict = DBKEYS) -> dict:
         dict: Success or error message
     """
     
+    # dbkeys that don't have any data yet. All of their data is downloaded with a single request.
+    dbkeys_download_all = []
+    
+    # dbkeys that aren't known to be successful yet (a copy so the caller's dict isn't modified)
+    remaining_dbkeys = dict(dbkeys)
+
     # Retrieve inflow data
-    for dbkey, station in dbkeys.copy().items():
+    for dbkey, station in dbkeys.items():
         file_name = f"{station}_FLOW_cmd.csv"
         date_latest = find_last_date_in_csv(workspace, file_name)
         
@@ -55,15 +61,15 @@ def main(workspace: str, dbkeys: dict = DBKEYS) -> dict:
         if date_latest is None:
             # Download all the data
             print(f'Downloading all inflow data for {station}')
-            hydro.get(workspace, dbkey)
+            dbkeys_download_all.append(dbkey)
         else:
             # Check whether the latest data is already up to date.
             if dbhydro_data_is_latest(date_latest):
                 # Notify that the data is already up to date
                 print(f'Downloading of new inflow data skipped for Station {station} (dbkey: {dbkey}). Data is already up to date.')
                 
-                # Remove dbkey from dbkeys so we know it didn't fail
-                del dbkeys[dbkey]
+                # Remove dbkey from the remaining dbkeys so we know it didn't fail
+                del remaining_dbkeys[dbkey]
                 continue
             
             # Download only the new data
@@ -86,6 +92,10 @@ def main(workspace: str, dbkeys: dict = DBKEYS) -> dict:
                 # Remove the old file
                 os.remove(os.path.join(workspace, f"{station}_FLOW_cmd.csv"))
 
+    # Download all of the data for the dbkeys that don't have any yet
+    if dbkeys_download_all:
+        hydro.get_batch(workspace, dbkeys_download_all)
+
     # Download S65E_total.csv Data
     date_latest = find_last_date_in_csv(workspace, "S65E_total.csv")
 
@@ -129,21 +139,21 @@ def main(workspace: str, dbkeys: dict = DBKEYS) -> dict:
     for file in files:
         file_dbkey = file.split("_")[-2]
 
-        if file_dbkey in dbkeys:
+        if file_dbkey in remaining_dbkeys:
             # Remove dbkey from file name
             new_file_name = file.replace(f"_{file_dbkey}", "")
             os.rename(file, new_file_name)
 
-            # Remove dbkey from dbkeys so we know it successfully downloaded
-            del dbkeys[file_dbkey]
+            # Remove dbkey from the remaining dbkeys so we know it successfully downloaded
+            del remaining_dbkeys[file_dbkey]
     
     # Check for failed downloads
-    if len(dbkeys) > 0 or not os.path.exists(f"{workspace}/S65E_total.csv"):
+    if len(remaining_dbkeys) > 0 or not os.path.exists(f"{workspace}/S65E_total.csv"):
         error_message = ""
         
         # dbkeys
-        if len(dbkeys) > 0:
-            error_message += f"The data from the following dbkeys could not be downloaded: {list(dbkeys.keys())}\n"
+        if len(remaining_dbkeys) > 0:
+            error_message += f"The data from the following dbkeys could not be downloaded: {list(remaining_dbkeys.keys())}\n"
         
         # S65E_total.csv
         if not os.path.exists(f"{workspace}/S65E_total.csv"):
@@ -59,25 +59,27 @@ def _get_outflow_data_from_station_ids(workspace: str, station_ids: list) -> dic
     dbkeys = list(get_dbkeys(station_ids, "SW", "FLOW", "MEAN", "PREF", detail_level="dbkey"))
     dbkeys.extend(list(get_dbkeys(station_ids, "SW", "FLOW", "MEAN", "DRV", detail_level="dbkey")))
 
-    for dbkey in dbkeys:
-        hydro.get(workspace, dbkey, "2000-01-01")
+    # Download the data of all of the dbkeys with a single request
+    if dbkeys:
+        hydro.get_batch(workspace, dbkeys, "2000-01-01")
 
     # Check if all files were downloaded
     files = glob(f"{workspace}/*FLOW*_cmd.csv")
+    remaining_dbkeys = set(dbkeys)
 
     for file in files:
         file_dbkey = file.split("_")[-2]
 
-        if file_dbkey in dbkeys:
+        if file_dbkey in remaining_dbkeys:
             # Remove dbkey from file name
             new_file_name = file.replace(f"_{file_dbkey}", "")
             os.rename(file, new_file_name)
 
-            # Remove dbkey from dbkeys so we know it successfully downloaded
-            dbkeys.remove(file_dbkey)
+            # Remove dbkey from the remaining dbkeys so we know it successfully downloaded
+            remaining_dbkeys.discard(file_dbkey)
 
-    if len(dbkeys) > 0:
-        return {"error": f"The data from the following dbkeys could not be downloaded: {dbkeys}"}
+    if len(remaining_dbkeys) > 0:
+        return {"error": f"The data from the following dbkeys could not be downloaded: {sorted(remaining_dbkeys)}"}
 
     return {"success": "Completed outflow flow data download."}
 
@@ -99,8 +101,14 @@ def main(workspace: str, dbkeys: dict = DBKEYS, station_ids: list = STATION_IDS)
     if dbkeys is None:
         return _get_outflow_data_from_station_ids(workspace, station_ids)
 
+    # dbkeys that don't have any data yet. All of their data is downloaded with a single request.
+    dbkeys_download_all = []
+    
+    # dbkeys that aren't known to be successful yet (a copy so the caller's dict isn't modified)
+    remaining_dbkeys = dict(dbkeys)
+
     # Get outflow data from dbkeys
-    for dbkey, station in dbkeys.copy().items():
+    for dbkey, station in dbkeys.items():
         # Get the date of the latest data in the csv file (if any)
         date_latest = find_last_date_in_csv(workspace, f"{station}_FLOW_cmd.csv")
         
@@ -108,15 +116,15 @@ def main(workspace: str, dbkeys: dict = DBKEYS, station_ids: list = STATION_IDS)
         if date_latest is None:
             # Download all data
             print(f'Downloading all outflow data for {station}')
-            hydro.get(workspace, dbkey, "2000-01-01")
+            dbkeys_download_all.append(dbkey)
         else:
             # Check whether the latest data is already up to date.
             if dbhydro_data_is_latest(date_latest):
                 # Notify that the data is already up to date
                 print(f'Downloading of new outflow data skipped for Station {station} (dbkey: {dbkey}). Data is already up to date.')
                 
-                # Remove dbkey from dbkeys so we know it didn't fail
-                del dbkeys[dbkey]
+                # Remove dbkey from the remaining dbkeys so we know it didn't fail
+                del remaining_dbkeys[dbkey]
                 continue
             
             # Download only the new data
@@ -139,22 +147,26 @@ def main(workspace: str, dbkeys: dict = DBKEYS, station_ids: list = STATION_IDS)
                 # Remove the old file
                 os.remove(os.path.join(workspace, f"{station}_FLOW_cmd.csv"))
 
+    # Download all of the data for the dbkeys that don't have any yet
+    if dbkeys_download_all:
+        hydro.get_batch(workspace, dbkeys_download_all, "2000-01-01")
+
     # Check if all files were downloaded
     files = glob(f"{workspace}/*FLOW*_cmd.csv")
 
     for file in files:
         file_dbkey = file.split("_")[-2]
 
-        if file_dbkey in dbkeys:
+        if file_dbkey in remaining_dbkeys:
             # Remove dbkey from file name
             new_file_name = file.replace(f"_{file_dbkey}", "")
             os.rename(file, new_file_name)
 
-            # Remove dbkey from dbkeys so we know it successfully downloaded
-            del dbkeys[file_dbkey]
+            # Remove dbkey from the remaining dbkeys so we know it successfully downloaded
+            del remaining_dbkeys[file_dbkey]
 
-    if len(dbkeys) > 0:
-        return {"error": f"The data from the following dbkeys could not be downloaded: {dbkeys}"}
+    if len(remaining_dbkeys) > 0:
+        return {"error": f"The data from the following dbkeys could not be downloaded: {sorted(remaining_dbkeys)}"}
 
     return {"success": "Completed outflow flow data download."}
 
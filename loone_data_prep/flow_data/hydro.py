@@ -1,122 +1,171 @@
 import sys
 from datetime import datetime
-from glob import glob
+from functools import lru_cache
 from retry import retry
 import os
 import pandas as pd
 from rpy2.robjects import r
+from rpy2.robjects.vectors import StrVector
 from rpy2.rinterface_lib.embedded import RRuntimeError
 
 
 DATE_NOW = datetime.now().strftime("%Y-%m-%d")
 
+# Converts a flow rate in cubic feet per second to cubic meters per day
+CFS_TO_CMD = 0.0283168466 * 86400
+
 
-@retry(RRuntimeError, tries=5, delay=15, max_delay=60, backoff=2)
 def get(
     workspace: str,
     dbkey: str,
     date_min: str = "1990-01-01",
     date_max: str = DATE_NOW
 ) -> None:
-    r_str = f"""
-    download_flow_data <- function(workspace, dbkey, date_min, date_max) 
-    {{
+    """Downloads the flow data of a single dbkey. See get_batch().
+
+    Args:
+        workspace (str): The path to the workspace directory to write the file to.
+        dbkey (str): The dbkey to download the flow data of.
+        date_min (str): The start date of the data in 'YYYY-MM-DD' format.
+        date_max (str): The end date of the data in 'YYYY-MM-DD' format.
+    """
+    get_batch(workspace, [dbkey], date_min, date_max)
+
+
+@lru_cache(maxsize=1)
+def _define_r_download_flow_data() -> None:
+    """Defines the R download_flow_data() function used by get_batch().
+    The definition (and loading of the R libraries) only needs to happen once per R session, so it is cached.
+    """
+    r_str = """
+    download_flow_data <- function(workspace, dbkeys, date_min, date_max, cfs_to_cmd) 
+    {
         # Load the required libraries
         library(dbhydroR)
         library(dplyr)
 
-        # Retrieve data for the dbkey
-        data <- get_hydro(dbkey = "{dbkey}", date_min = "{date_min}", date_max = "{date_max}", raw = TRUE)
+        # Retrieve data for all of the dbkeys at once
+        data_all <- get_hydro(dbkey = dbkeys, date_min = date_min, date_max = date_max, raw = TRUE)
         
         # Check if data is empty or contains only the "date" column
-        if (ncol(data) <= 1) {{
-            cat("No data found for dbkey", "{dbkey}", "Skipping to the next dbkey.\n")
-        }}
+        if (ncol(data_all) <= 1 || nrow(data_all) == 0) {
+            print(paste("Empty data.frame returned for dbkeys", paste(dbkeys, collapse = ", "), "It's possible that the dbkeys have reached their end date. Skipping."))
+            return(list(dbkey = character(0), station = character(0)))
+        }
         
         # Give data.frame correct column names so it can be cleaned using the clean_hydro function
-        colnames(data) <- c("station", "dbkey", "date", "data.value", "qualifer", "revision.date")
+        colnames(data_all) <- c("station", "dbkey", "date", "data.value", "qualifer", "revision.date")
         
-        # Check if the data.frame has any rows
-        if (nrow(data) == 0) 
-        {{
-            # No data given back, It's possible that the dbkey has reached its end date.
-            print(paste("Empty data.frame returned for dbkey", "{dbkey}", "It's possible that the dbkey has reached its end date. Skipping to the next dbkey."))
-            return(list(success = FALSE, dbkey = "{dbkey}"))
-        }}
+        # dbkeys may be returned without their leading zeros
+        data_all_dbkeys <- sub("^0+", "", as.character(data_all$dbkey))
         
-        # Add a type and units column to data so it can be cleaned using the clean_hydro function
-        data$type <- "FLOW"
-        data$units <- "cfs"
+        downloaded_dbkeys <- character(0)
+        downloaded_stations <- character(0)
         
-        # Get the station
-        station <- data$station[1]
-        
-        # Clean the data.frame
-        data <- clean_hydro(data)
+        for (dbkey in dbkeys) 
+        {
+            # Get the data of the current dbkey
+            data <- data_all[data_all_dbkeys == sub("^0+", "", dbkey), ]
+            
+            # Check if the data.frame has any rows
+            if (nrow(data) == 0) 
+            {
+                # No data given back, It's possible that the dbkey has reached its end date.
+                print(paste("Empty data.frame returned for dbkey", dbkey, "It's possible that the dbkey has reached its end date. Skipping to the next dbkey."))
+                next
+            }
+            
+            # Add a type and units column to data so it can be cleaned using the clean_hydro function
+            data$type <- "FLOW"
+            data$units <- "cfs"
+            
+            # Get the station
+            station <- data$station[1]
+            
+            # Clean the data.frame
+            data <- clean_hydro(data)
 
-        # Multiply all columns except "date" column by 0.0283168466 * 86400 to convert Flow rate from cfs to m³/day
-        data[, -1] <- data[, -1] * (0.0283168466 * 86400)
-        
-        # Drop the " _FLOW_cfs" column
-        data <- data %>% select(-` _FLOW_cfs`)    
-        
-        # Sort the data by date
-        data <- data[order(data$date), ]
-        
-        # Get the filename for the output CSV file
-        filename <- paste0(station, "_FLOW", "_{dbkey}_cmd.csv")
-        
-        # Save data to a CSV file
-        write.csv(data, file = paste0("{workspace}/", filename))
+            # Drop the " _FLOW_cfs" column (before converting, so it isn't converted for nothing)
+            data <- data %>% select(-` _FLOW_cfs`)    
+            
+            # Multiply all columns except "date" column by cfs_to_cmd to convert Flow rate from cfs to m³/day
+            data[, -1] <- data[, -1] * cfs_to_cmd
+            
+            # Sort the data by date
+            data <- data[order(data$date), ]
+            
+            # Get the filename for the output CSV file
+            filename <- paste0(station, "_FLOW_", dbkey, "_cmd.csv")
+            
+            # Save data to a CSV file
+            write.csv(data, file = paste0(workspace, "/", filename))
 
-        # Print a message indicating the file has been saved
-        cat("CSV file", filename, "has been saved.\n")
+            # Print a message indicating the file has been saved
+            cat("CSV file", filename, "has been saved.\n")
+            
+            downloaded_dbkeys <- c(downloaded_dbkeys, dbkey)
+            downloaded_stations <- c(downloaded_stations, station)
+        }
 
         # Add a delay between requests
-        Sys.sleep(1)  # Wait for 1 second before the next iteration
+        Sys.sleep(1)  # Wait for 1 second before the next request
         
-        # Return the station and dbkey to the python code
-        list(success = TRUE, station = station, dbkey = "{dbkey}")
-    }}
+        # Return the stations and dbkeys to the python code
+        list(dbkey = downloaded_dbkeys, station = downloaded_stations)
+    }
     """
 
     r(r_str)
-    
-    # Call the R function to download the flow data
-    result = r.download_flow_data(workspace, dbkey, date_min, date_max)
-    
-    # Check for failure
-    success = result.rx2("success")[0]
 
-    if not success:
-        return
+
+@retry(RRuntimeError, tries=5, delay=15, max_delay=60, backoff=2)
+def get_batch(
+    workspace: str,
+    dbkeys: list,
+    date_min: str = "1990-01-01",
+    date_max: str = DATE_NOW
+) -> list:
+    """Downloads the flow data of the given dbkeys with a single request.
+    Each dbkey's data is written to <station>_FLOW_<dbkey>_cmd.csv in the workspace.
     
-    # Get the station name for _reformat_flow_file()
-    station = result.rx2("station")[0]
+    Args:
+        workspace (str): The path to the workspace directory to write the files to.
+        dbkeys (list): The dbkeys to download the flow data of.
+        date_min (str): The start date of the data in 'YYYY-MM-DD' format.
+        date_max (str): The end date of the data in 'YYYY-MM-DD' format.
+        
+    Returns:
+        list: The dbkeys that had data and were written out.
+    """
+    # Define the R function used to download the data (only done once per session)
+    _define_r_download_flow_data()
+    
+    # Call the R function to download the flow data
+    result = r.download_flow_data(workspace, StrVector(dbkeys), date_min, date_max, CFS_TO_CMD)
     
-    # Reformat the flow data file to the expected layout
-    _reformat_flow_file(workspace, station, dbkey)
+    downloaded_dbkeys = list(result.rx2("dbkey"))
     
-    # Check if the station name contains a space
-    if " " in station:
-        # Replace space with underscore in the station name
-        station_previous = station
-        station = station.replace(" ", "_")
+    for dbkey, station in zip(downloaded_dbkeys, result.rx2("station")):
+        # Reformat the flow data file to the expected layout
+        _reformat_flow_file(workspace, station, dbkey)
         
-        # Rename the file
-        os.rename(f"{workspace}/{station_previous}_FLOW_{dbkey}_cmd.csv", f"{workspace}/{station}_FLOW_{dbkey}_cmd.csv")
-
-    # column values are converted to cmd in R. This snippet makes sure column names are updated accordingly.
-    file = glob(f'{workspace}/*FLOW*{dbkey}_cmd.csv')[0]
-    df = pd.read_csv(file, index_col=False)
-    df.columns = df.columns.astype(str).str.replace("_cfs", "_cmd")
-    df.to_csv(file, index=False)
+        # Check if the station name contains a space
+        if " " in station:
+            # Replace space with underscore in the station name
+            station_previous = station
+            station = station.replace(" ", "_")
+            
+            # Rename the file
+            os.rename(f"{workspace}/{station_previous}_FLOW_{dbkey}_cmd.csv", f"{workspace}/{station}_FLOW_{dbkey}_cmd.csv")
+    
+    return downloaded_dbkeys
 
 
 def _reformat_flow_file(workspace:str, station: str, dbkey: str):
     '''
     Reformat the flow data file to the expected layout.
-    Converts the format of the dates in the file to 'YYYY-MM-DD' then sorts the data by date.
+    Converts the format of the dates in the file to 'YYYY-MM-DD', sorts the data by date, and renames the
+    flow column from *_FLOW_cfs to *_FLOW_cmd (the values are converted to cmd in R).
     Reads and writes to a .CSV file.
     
     Args:
@@ -127,23 +176,24 @@ def _reformat_flow_file(workspace:str, station: str, dbkey: str):
     Returns:
         None
     '''
-    # Read in the data
-    df = pd.read_csv(f"{workspace}/{station}_FLOW_{dbkey}_cmd.csv")
-    
-    # Grab only the columns we need
-    df = df[['date', f'{station}_FLOW_cfs']]
+    # Read in only the columns we need
+    df = pd.read_csv(f"{workspace}/{station}_FLOW_{dbkey}_cmd.csv", usecols=['date', f'{station}_FLOW_cfs'])
     
-    # Convert date column to datetime
-    df['date'] = pd.to_datetime(df['date'], format='%d-%b-%Y')
+    # Convert date column to datetime (repeated date strings are only parsed once)
+    df['date'] = pd.to_datetime(df['date'], format='%d-%b-%Y', cache=True)
     
-    # Sort the data by date
-    df.sort_values('date', inplace=True)
+    # Sort the data by date (the data usually already comes back sorted from R)
+    if not df['date'].is_monotonic_increasing:
+        df.sort_values('date', inplace=True)
     
     # Renumber the index
     df.reset_index(drop=True, inplace=True)
     
     # Drop rows that are missing values for both the date and value columns
-    df = df.drop(df[(df['date'].isna()) & (df[f'{station}_FLOW_cfs'].isna())].index)
+    df.dropna(how='all', subset=['date', f'{station}_FLOW_cfs'], inplace=True)
+    
+    # Column values are converted to cmd in R. Update the column name accordingly.
+    df.rename(columns={f'{station}_FLOW_cfs': f'{station}_FLOW_cmd'}, inplace=True)
     
     # Write the updated data back to the file
     df.to_csv(f"{workspace}/{station}_FLOW_{dbkey}_cmd.csv")
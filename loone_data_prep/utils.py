@@ -1,15 +1,14 @@
 import sys
 import os
 import datetime
-import math
+import io
 from glob import glob
-from calendar import monthrange
 import traceback
+from functools import lru_cache
 import numpy as np
 import pandas as pd
+import requests
 from retry import retry
-from scipy.optimize import fsolve
-from scipy import interpolate
 from rpy2.robjects import r
 from rpy2.robjects.vectors import (
     StrVector as rpy2StrVector,
@@ -18,6 +17,21 @@ from rpy2.robjects.vectors import (
 from rpy2.rinterface_lib.embedded import RRuntimeError
 
 
+# Month numbers of the month abbreviations used in dbhydro dates
+MONTH_NUMBERS = {
+    "JAN": 1,
+    "FEB": 2,
+    "MAR": 3,
+    "APR": 4,
+    "MAY": 5,
+    "JUN": 6,
+    "JUL": 7,
+    "AUG": 8,
+    "SEP": 9,
+    "OCT": 10,
+    "NOV": 11,
+    "DEC": 12,
+}
 DEFAULT_STATION_IDS = ["L001", "L005", "L006", "LZ40"]
 INTERP_DICT = {
     "PHOSPHATE, TOTAL AS P": {
@@ -252,19 +266,23 @@ def get_dbkeys(
         rpy2StrVector | rpy2DataFrame: dbkeys info at the specified detail level.
     """
 
-    station_ids_str = '"' + '", "'.join(station_ids) + '"'
-
-    dbkeys = r(
-        f"""
-        library(dbhydroR)
-
-        station_ids <- c({station_ids_str})
-        dbkeys <- get_dbkey(stationid = station_ids,  category = "{category}", param = "{param}", stat = "{stat}", recorder="{recorder}", freq = "{freq}", detail.level = "{detail_level}")
-        print(dbkeys)
-        return(dbkeys)
+    # The arguments are passed to R as values instead of being pasted into the R code, so characters like quotes
+    # in station ids can't break (or change) the code that gets run
+    r(
+        """
+        get_dbkeys <- function(station_ids, category, param, stat, recorder, freq, detail_level)
+        {
+            library(dbhydroR)
+
+            dbkeys <- get_dbkey(stationid = station_ids, category = category, param = param, stat = stat, recorder = recorder, freq = freq, detail.level = detail_level)
+            print(dbkeys)
+            return(dbkeys)
+        }
         """  # noqa: E501
     )
 
+    dbkeys = r.get_dbkeys(rpy2StrVector(station_ids), category, param, stat, recorder, freq, detail_level)
+
     return dbkeys
 
 
@@ -287,6 +305,7 @@ def data_interpolations(
     for station in station_ids:
         name = f"{station}_{parameter}"
         path = f"{workspace}/{name}.csv"
+        column = f"{station}_{parameter}_{units}"
 
         if not os.path.exists(path):
             name = f"water_quality_{name}"
@@ -295,19 +314,20 @@ def data_interpolations(
                 print(f'Skipping "{name}" File does not exist.')
                 continue
 
-        Data_In = pd.read_csv(path)
+        Data_In = pd.read_csv(
+            path,
+            usecols=["date", column],
+            parse_dates=["date"],
+            index_col="date",
+        )
 
         # check there is more than one row in the file for interpolation.
         if len(Data_In.iloc[:]) < 10:
             print(f'"{name}" file does not have enough values to interpolate.')
             continue
 
-        Data_In = Data_In.set_index(["date"])
-        Data_In.index = pd.to_datetime(Data_In.index, unit="ns")
         Data_df = Data_In.resample("D").mean()
-        Data_df = Data_df.dropna(
-            subset=["%s_%s_%s" % (station, parameter, units)]
-        )
+        Data_df = Data_df.dropna(subset=[column])
         Data_df = Data_df.reset_index()
         Data_df["Yr_M"] = pd.to_datetime(Data_df["date"]).dt.to_period("M")
         start_date = Data_df["date"].iloc[0]
@@ -317,56 +337,27 @@ def data_interpolations(
         Monthly_df["Yr_M"] = pd.to_datetime(Monthly_df["date"]).dt.to_period(
             "M"
         )
-        New_date = []
-        New_data = []
-        Days = []
-        Days_cum = []
-        # Set index for the two dataframes
-        Data_df = Data_df.set_index(["Yr_M"])
-        Monthly_df = Monthly_df.set_index(["Yr_M"])
-        for i in Monthly_df.index:
-            if i in Data_df.index:
-                if type(Data_df.loc[i]["date"]) == pd.Timestamp:
-                    New_date.append(Data_df.loc[i]["date"])
-                    New_data.append(
-                        Data_df.loc[i][
-                            "%s_%s_%s" % (station, parameter, units)
-                        ]
-                    )
-                else:
-                    for j in range(len(Data_df.loc[i]["date"])):
-                        New_date.append(Data_df.loc[i]["date"][j])
-                        New_data.append(
-                            Data_df.loc[i][
-                                "%s_%s_%s" % (station, parameter, units)
-                            ][j]
-                        )
-            elif i not in Data_df.index:
-                New_date.append(
-                    datetime.datetime(
-                        Monthly_df.loc[i]["date"].year,
-                        Monthly_df.loc[i]["date"].month,
-                        1,
-                    )
-                )
-                New_data.append(np.NaN)
+        # Join the data onto every month in the date range. Months without data get a single row dated the
+        # first of the month with a NaN value.
+        Merged_df = Monthly_df[["Yr_M"]].merge(
+            Data_df[["Yr_M", "date", column]],
+            on="Yr_M",
+            how="left",
+        )
+        New_date = pd.DatetimeIndex(
+            Merged_df["date"].fillna(Merged_df["Yr_M"].dt.start_time)
+        )
+        New_data = Merged_df[column].to_numpy()
 
-        New_date = pd.to_datetime(New_date, format="%Y-%m-%d")
         Days = New_date.strftime("%d").astype(float)
-        for i in range(len(Days)):
-            if i == 0:
-                Days_cum.append(Days[i])
-            elif New_date[i].month == New_date[i - 1].month:
-                Days_cum.append(Days_cum[i - 1] + (Days[i] - Days[i - 1]))
-            elif New_date[i].month != New_date[i - 1].month:
-                Days_cum.append(
-                    Days_cum[i - 1]
-                    + Days[i]
-                    + monthrange(New_date[i - 1].year, New_date[i - 1].month)[
-                        1
-                    ]
-                    - Days[i - 1]
-                )
+        # Cumulative days since the start of the first month. Each step adds the change in day of month, plus the
+        # length of the previous month when the month rolls over.
+        month = New_date.month.to_numpy()
+        month_length = New_date.days_in_month.to_numpy(dtype=float)
+        Days_step = np.diff(Days.to_numpy()) + np.where(
+            month[1:] != month[:-1], month_length[:-1], 0
+        )
+        Days_cum = Days[0] + np.concatenate(([0.0], np.cumsum(Days_step)))
         Final_df = pd.DataFrame()
         Final_df["date"] = New_date
         Final_df["Data"] = New_data
@@ -384,17 +375,14 @@ def data_interpolations(
         # Create a data frame with a date column
         Data_df = pd.DataFrame(date_rng_TSS_1, columns=["date"])
         Data_len = len(Data_df.index)
-        Cum_days = np.zeros(Data_len)
-        Data_daily = np.zeros(Data_len)
-        # Set initial values
-        Cum_days[0] = Data_df["date"].iloc[0].day
-        Data_daily[0] = Final_df["Data"].iloc[0]
-        for i in range(1, Data_len):
-            Cum_days[i] = Cum_days[i - 1] + 1
-            # Data_daily[i] = interpolate.interp1d(Final_df['Days'], Final_df['TSS'] , kind = 'linear')(Cum_days[i])
-            Data_daily[i] = np.interp(
-                Cum_days[i], Final_df["Days_cum"], Final_df["Data"]
-            )
+        # Cumulative days of each daily date, counted the same way as Days_cum
+        Cum_days = Data_df["date"].iloc[0].day + np.arange(Data_len, dtype=float)
+        # Interpolate all days at once. The first day lands on (or before) the first sample, so it takes its value.
+        Data_daily = np.interp(
+            Cum_days,
+            Final_df["Days_cum"].to_numpy(dtype=float),
+            Final_df["Data"].to_numpy(dtype=float),
+        )
         Data_df["Data"] = Data_daily
         Data_df.to_csv(f"{workspace}/{name}_Interpolated.csv", index=False)
 
@@ -419,40 +407,15 @@ def kinematic_viscosity(
     workspace: str, in_file_name: str, out_file_name: str = "nu.csv"
 ):
     # Read Mean H2O_T in LO
-    LO_Temp = pd.read_csv(os.path.join(workspace, in_file_name))
+    LO_Temp = pd.read_csv(
+        os.path.join(workspace, in_file_name),
+        usecols=["date", "Water_T"],
+        dtype={"Water_T": np.float64},
+    )
     LO_T = LO_Temp["Water_T"]
 
-    n = len(LO_T.index)
-
-    class nu_Func:
-        def nu(T):
-            nu20 = (
-                1.0034 / 1e6
-            )  # m2/s (kinematic viscosity of water at T = 20 C)
-
-            def func(x):
-                # return[log(x[0]/nu20)-((20-T)/(T+96))*(1.2364-1.37E-3*(20-T)+5.7E-6*(20-T)**2)]
-                return [
-                    (x[0] / nu20)
-                    - 10
-                    ** (
-                        ((20 - T) / (T + 96))
-                        * (
-                            1.2364
-                            - 1.37e-3 * (20 - T)
-                            + 5.7e-6 * (20 - T) ** 2
-                        )
-                    )
-                ]
-
-            sol = fsolve(func, [9.70238995692062e-07])
-            nu = sol[0]
-            return nu
-
-    nu = np.zeros(n, dtype=object)
-
-    for i in range(n):
-        nu[i] = nu_Func.nu(LO_T[i])
+    # Kinematic viscosity of water (m2/s)
+    nu = _kinematic_viscosity(LO_T.to_numpy(dtype=np.float64))
 
     nu_df = pd.DataFrame(LO_Temp["date"], columns=["date"])
     nu_df["nu"] = nu
@@ -468,10 +431,18 @@ def wind_induced_waves(
     current_shear_stress_out: str = "Current_ShearStress.csv",
 ):
     # Read Mean Wind Speed in LO
-    LO_WS = pd.read_csv(os.path.join(f"{input_dir}/", wind_speed_in))
+    LO_WS = pd.read_csv(
+        os.path.join(f"{input_dir}/", wind_speed_in),
+        usecols=["date", "LO_Avg_WS_MPH"],
+        dtype={"LO_Avg_WS_MPH": np.float64},
+    )
     LO_WS["WS_mps"] = LO_WS["LO_Avg_WS_MPH"] * 0.44704  # MPH to m/s
     # Read LO Stage to consider water depth changes
-    LO_Stage = pd.read_csv(os.path.join(f"{input_dir}/", lo_stage_in))
+    LO_Stage = pd.read_csv(
+        os.path.join(f"{input_dir}/", lo_stage_in),
+        usecols=["Stage_ft"],
+        dtype={"Stage_ft": np.float64},
+    )
     LO_Stage["Stage_m"] = LO_Stage["Stage_ft"] * 0.3048
     Bottom_Elev = 0.5  # m (Karl E. Havens • Alan D. Steinman 2013)
     LO_Wd = LO_Stage["Stage_m"] - Bottom_Elev
@@ -483,63 +454,19 @@ def wind_induced_waves(
 
     n = len(LO_WS.index)
 
-    class Wind_Func:
-        def H(g, d, F, WS):
-            H = (
-                (
-                    0.283
-                    * np.tanh(0.53 * (g * d / WS**2) ** 0.75)
-                    * np.tanh(
-                        0.00565
-                        * (g * F / WS**2) ** 0.5
-                        / np.tanh(0.53 * (g * d / WS**2) ** (3 / 8))
-                    )
-                )
-                * WS**2
-                / g
-            )  # noqa: E501
-            return H
-
-        def T(g, d, F, WS):
-            T = (
-                (
-                    7.54
-                    * np.tanh(0.833 * (g * d / WS**2) ** (3 / 8))
-                    * np.tanh(
-                        0.0379
-                        * (g * F / WS**2) ** 0.5
-                        / np.tanh(0.833 * (g * d / WS**2) ** (3 / 8))
-                    )
-                )
-                * WS
-                / g
-            )  # noqa: E501
-            return T
-
-        def L(g, d, T):
-            def func(x):
-                return [
-                    (g * T**2 / 2 * np.pi) * np.tanh(2 * np.pi * d / x[0])
-                    - x[0]
-                ]
-
-            sol = fsolve(func, [1])
-            L = sol[0]
-            return L
-
-    W_H = np.zeros(n, dtype=object)
-    W_T = np.zeros(n, dtype=object)
-    W_L = np.zeros(n, dtype=object)
-    W_ShearStress = np.zeros(n, dtype=object)
-    for i in range(n):
-        W_H[i] = Wind_Func.H(g, LO_Wd[i], F, LO_WS["WS_mps"].iloc[i])
-        W_T[i] = Wind_Func.T(g, LO_Wd[i], F, LO_WS["WS_mps"].iloc[i])
-        W_L[i] = Wind_Func.L(g, LO_Wd[i], W_T[i])
-        W_ShearStress[i] = (
-            W_H[i]
-            * (ru * (nu * (2 * np.pi / W_T[i]) ** 3) ** 0.5)
-            / (2 * np.sinh(2 * np.pi * LO_Wd[i] / W_L[i]))
-        )
+    # Wind speed and water depth per day (the depth series is matched to the wind speed rows)
+    WS = LO_WS["WS_mps"].to_numpy(dtype=np.float64)
+    d = LO_Wd.to_numpy(dtype=np.float64)[:n]
+
+    # Wave height, period and length
+    W_H = _wave_height(g, d, F, WS)
+    W_T = _wave_period(g, d, F, WS)
+    W_L = _wave_length(g, d, W_T)
+    W_ShearStress = (
+        W_H
+        * (ru * (nu * (2 * np.pi / W_T) ** 3) ** 0.5)
+        / (2 * np.sinh(2 * np.pi * d / W_L))
+    )
 
     Wind_ShearStress = pd.DataFrame(LO_WS["date"], columns=["date"])
     Wind_ShearStress["ShearStress"] = (
@@ -560,27 +487,18 @@ def wind_induced_waves(
     # Wind_ShearStress_df.to_csv('C:/Work/Research/Data Analysis/Lake_O_Weather_Data/WindSpeed_Processed/WindShearStress_M.csv')  # noqa: E501
 
     # The drag coefficient
-    CD = 0.001 * (0.75 + 0.067 * LO_WS["WS_mps"])
+    CD = 0.001 * (0.75 + 0.067 * WS)
     air_ru = 1.293  # kg/m3
 
-    def tau_w(WS, CD, air_ru):
-        tau_w = air_ru * CD * (WS**2)
-        return tau_w
-
-    def Current_bottom_shear_stress(ru, tau_w):
-        # Constants
-        kappa = 0.41  # Von Karman constant
-        # Calculate the bottom friction velocity
-        u_b = math.sqrt(tau_w / ru)
-        # Calculate the bottom shear stress
-        tau_b = ru * kappa**2 * u_b**2
-        return tau_b
-
-    Current_Stress = np.zeros(n, dtype=object)
-    Wind_Stress = np.zeros(n, dtype=object)
-    for i in range(n):
-        Wind_Stress[i] = tau_w(LO_WS["WS_mps"].iloc[i], CD[i], air_ru)
-        Current_Stress[i] = Current_bottom_shear_stress(ru, Wind_Stress[i])
+    # Wind stress on the water surface
+    Wind_Stress = air_ru * CD * WS**2
+
+    # Current induced bottom shear stress
+    kappa = 0.41  # Von Karman constant
+    # Calculate the bottom friction velocity
+    u_b = np.sqrt(Wind_Stress / ru)
+    # Calculate the bottom shear stress
+    Current_Stress = ru * kappa**2 * u_b**2
 
     Current_ShearStress_df = pd.DataFrame(LO_WS["date"], columns=["date"])
     Current_ShearStress_df["Current_Stress"] = (
@@ -591,72 +509,8 @@ def wind_induced_waves(
     )  # Convert N/m2 to Dyne/cm2
     Current_ShearStress_df["Wind_Speed_m/s"] = LO_WS["WS_mps"]
 
-    def Current_bottom_shear_stress_2(u, k, nu, ks, z, ru):
-        def func1(u_str1):
-            return [u_str1[0] - u * k * np.exp(z / (0.11 * nu / u_str1[0]))]
-
-        sol1 = fsolve(func1, [1])
-
-        def func2(u_str2):
-            return [u_str2[0] - u * k * np.exp(z / (0.0333 * ks))]
-
-        sol2 = fsolve(func2, [1])
-
-        def func3(u_str3):
-            return [
-                u_str3[0]
-                - u * k * np.exp(z / ((0.11 * nu / u_str3[0]) + 0.0333 * ks))
-            ]
-
-        sol3 = fsolve(func3, [1])
-        if sol1[0] * ks / nu <= 5:
-            u_str = sol1[0]
-        elif sol2[0] * ks / nu >= 70:
-            u_str = sol2[0]
-        elif sol3[0] * ks / nu > 5 and sol3[0] * ks / nu < 70:
-            u_str = sol3[0]
-        tau_c = ru * u_str**2
-        return tau_c
-
-    def Current_bottom_shear_stress_3(u, k, nu, ks, z, ru):
-        def func1(u_str1):
-            return [
-                u_str1[0] - u * k * (1 / np.log(z / (0.11 * nu / u_str1[0])))
-            ]
-
-        sol1 = fsolve(func1, [1])
-
-        def func2(u_str2):
-            return [u_str2[0] - u * k * (1 / np.log(z / (0.0333 * ks)))]
-
-        sol2 = fsolve(func2, [1])
-
-        def func3(u_str3):
-            return [
-                u_str3[0]
-                - u
-                * k
-                * (1 / np.log(z / ((0.11 * nu / u_str3[0]) + 0.0333 * ks)))
-            ]
-
-        sol3 = fsolve(func3, [1])
-        if sol1[0] * ks / nu <= 5:
-            u_str = sol1[0]
-        elif sol2[0] * ks / nu >= 70:
-            u_str = sol2[0]
-        elif sol3[0] * ks / nu > 5 and sol3[0] * ks / nu < 70:
-            u_str = sol3[0]
-        else:
-            u_str = 0
-        tau_c = ru * u_str**2
-        return tau_c
-
     ks = 5.27e-4  # m
-    current_stress_3 = np.zeros(n, dtype=object)
-    for i in range(n):
-        current_stress_3[i] = Current_bottom_shear_stress_3(
-            0.05, 0.41, nu, ks, LO_Wd[i], ru
-        )
+    current_stress_3 = _current_bottom_shear_stress_3(0.05, 0.41, nu, ks, d, ru)
     Current_ShearStress_df["Current_Stress_3"] = (
         current_stress_3 * 10
     )  # Convert N/m2 to Dyne/cm2
@@ -665,53 +519,238 @@ def wind_induced_waves(
     )
 
 
+def _kinematic_viscosity(T: np.ndarray) -> np.ndarray:
+    """Calculates the kinematic viscosity of water. Solving
+    log(nu/nu20) = ((20-T)/(T+96))*(1.2364-1.37E-3*(20-T)+5.7E-6*(20-T)**2) for nu gives it directly.
+
+    Args:
+        T (np.ndarray): The water temperatures (C).
+
+    Returns:
+        np.ndarray: The kinematic viscosities (m2/s).
+    """
+    nu20 = 1.0034 / 1e6  # m2/s (kinematic viscosity of water at T = 20 C)
+    dT = 20 - T
+    # Polynomial in (20-T) evaluated in Horner form
+    poly = 1.2364 + dT * (-1.37e-3 + dT * 5.7e-6)
+    return nu20 * np.exp(np.log(10) * (dT / (T + 96)) * poly)
+
+
+def _wave_height(g: float, d: np.ndarray, F: float, WS: np.ndarray) -> np.ndarray:
+    """Calculates the height of wind induced waves.
+
+    Args:
+        g (float): Gravitational acceleration (m/s2).
+        d (np.ndarray): Water depths (m).
+        F (float): Fetch length of the wind (m).
+        WS (np.ndarray): Wind speeds (m/s).
+
+    Returns:
+        np.ndarray: The wave heights (m).
+    """
+    gd_WS2 = g * d / WS**2
+    gF_WS2 = g * F / WS**2
+    return (
+        0.283
+        * np.tanh(0.53 * gd_WS2**0.75)
+        * np.tanh(0.00565 * gF_WS2**0.5 / np.tanh(0.53 * gd_WS2 ** (3 / 8)))
+        * WS**2
+        / g
+    )
+
+
+def _wave_period(g: float, d: np.ndarray, F: float, WS: np.ndarray) -> np.ndarray:
+    """Calculates the period of wind induced waves.
+
+    Args:
+        g (float): Gravitational acceleration (m/s2).
+        d (np.ndarray): Water depths (m).
+        F (float): Fetch length of the wind (m).
+        WS (np.ndarray): Wind speeds (m/s).
+
+    Returns:
+        np.ndarray: The wave periods (s).
+    """
+    gd_WS2 = g * d / WS**2
+    gF_WS2 = g * F / WS**2
+    return (
+        7.54
+        * np.tanh(0.833 * gd_WS2 ** (3 / 8))
+        * np.tanh(0.0379 * gF_WS2**0.5 / np.tanh(0.833 * gd_WS2 ** (3 / 8)))
+        * WS
+        / g
+    )
+
+
+def _wave_length(g: float, d: np.ndarray, T: np.ndarray) -> np.ndarray:
+    """Calculates the length of wind induced waves by solving (g*T**2/2*pi)*tanh(2*pi*d/L) - L = 0.
+    The left hand side is monotonically decreasing in L, so starting from its upper bound (tanh -> 1) converges to
+    the same root fsolve finds.
+
+    Args:
+        g (float): Gravitational acceleration (m/s2).
+        d (np.ndarray): Water depths (m).
+        T (np.ndarray): Wave periods (s).
+
+    Returns:
+        np.ndarray: The wave lengths (m).
+    """
+    A = g * T**2 / 2 * np.pi
+    kd = 2 * np.pi * d
+    return _solve_newton(
+        lambda L: A * np.tanh(kd / L) - L,
+        lambda L: -A * (1 - np.tanh(kd / L) ** 2) * kd / L**2 - 1,
+        A.copy(),
+        rtol=1e-12,
+    )
+
+
+def _current_bottom_shear_stress_3(
+    u: float, k: float, nu: float, ks: float, z: np.ndarray, ru: float
+) -> np.ndarray:
+    """Calculates the current induced bottom shear stress, choosing the friction velocity for smooth, rough or
+    transitional flow. Each friction velocity solves u_str = u*k/log(z/z0(u_str)), written here as
+    u_str*log(z/z0(u_str)) - u*k = 0.
+
+    Args:
+        u (float): Current velocity (m/s).
+        k (float): Von Karman constant.
+        nu (float): Kinematic viscosity of water (m2/s).
+        ks (float): Bottom roughness height (m).
+        z (np.ndarray): Water depths (m).
+        ru (float): Density of water (kg/m3).
+
+    Returns:
+        np.ndarray: The bottom shear stresses (N/m2).
+    """
+    # Smooth flow: z0 = 0.11*nu/u_str
+    sol1 = _solve_newton(
+        lambda x: x * np.log(z * x / (0.11 * nu)) - u * k,
+        lambda x: np.log(z * x / (0.11 * nu)) + 1,
+        np.ones_like(z),
+    )
+    # Rough flow: z0 = 0.0333*ks
+    sol2 = u * k / np.log(z / (0.0333 * ks))
+    # Transitional flow: z0 = 0.11*nu/u_str + 0.0333*ks
+    sol3 = _solve_newton(
+        lambda x: x * np.log(z / (0.11 * nu / x + 0.0333 * ks)) - u * k,
+        lambda x: np.log(z / (0.11 * nu / x + 0.0333 * ks)) + 0.11 * nu / (0.11 * nu + 0.0333 * ks * x),
+        np.ones_like(z),
+    )
+    u_str = np.select(
+        [
+            sol1 * ks / nu <= 5,
+            sol2 * ks / nu >= 70,
+            (sol3 * ks / nu > 5) & (sol3 * ks / nu < 70),
+        ],
+        [sol1, sol2, sol3],
+        default=0,
+    )
+    tau_c = ru * u_str**2
+    return tau_c
+
+
+def _solve_newton(f, df, x: np.ndarray, rtol: float = 1e-14, max_iter: int = 100) -> np.ndarray:
+    """Solves f(x) = 0 elementwise with Newton's method.
+
+    Args:
+        f (Callable): The function to find the roots of.
+        df (Callable): The derivative of f.
+        x (np.ndarray): The initial guesses.
+        rtol (float, optional): Relative step size to stop at. Defaults to 1e-14.
+        max_iter (int, optional): Maximum number of iterations. Defaults to 100.
+
+    Returns:
+        np.ndarray: The roots.
+    """
+    for _ in range(max_iter):
+        step = f(x) / df(x)
+        x = x - step
+        if not np.any(np.abs(step) > rtol * np.abs(x)):
+            break
+    return x
+
+
 def stg2sto(
     stg_sto_data_path: str, v: pd.Series, i: int
-) -> interpolate.interp1d:
-    stgsto_data = pd.read_csv(stg_sto_data_path)
-    # NOTE: We Can use cubic interpolation instead of linear
-    x = stgsto_data["Stage"]
-    y = stgsto_data["Storage"]
-    if i == 0:
-        # return storage given stage
-        return interpolate.interp1d(
-            x, y, fill_value="extrapolate", kind="linear"
-        )(v)
-    else:
-        # return stage given storage
-        return interpolate.interp1d(
-            y, x, fill_value="extrapolate", kind="linear"
-        )(v)
+) -> np.ndarray:
+    # return storage given stage (i == 0) or stage given storage
+    return _stage_interpolation(stg_sto_data_path, "Storage", v, i)
+
 
+def stg2ar(stgar_data_path: str, v: pd.Series, i: int) -> np.ndarray:
+    # return surface area given stage (i == 0) or stage given surface area
+    return _stage_interpolation(stgar_data_path, "Surf_Area", v, i)
 
-def stg2ar(stgar_data_path: str, v: pd.Series, i: int) -> interpolate.interp1d:
-    import pandas as pd
-    from scipy import interpolate
 
-    stgar_data = pd.read_csv(stgar_data_path)
+@lru_cache(maxsize=8)
+def _read_stage_table(data_path: str, modified_time: float, x_column: str, y_column: str) -> tuple:
+    """Reads two columns of a stage table, sorted by the first one. Cached since the same tables are reused across
+    calls.
+
+    Args:
+        data_path (str): The path to the .csv file holding the stage table.
+        modified_time (float): The modification time of the file. Only part of the cache key, so changed files are
+            read again.
+        x_column (str): The column to interpolate from.
+        y_column (str): The column to interpolate to.
+
+    Returns:
+        tuple: The x and y values as float arrays, sorted by x.
+    """
+    stage_data = pd.read_csv(data_path, usecols=[x_column, y_column])
+    x = stage_data[x_column].to_numpy(dtype=np.float64)
+    y = stage_data[y_column].to_numpy(dtype=np.float64)
+    order = np.argsort(x, kind="mergesort")
+    return x[order], y[order]
+
+
+def _stage_interpolation(data_path: str, column: str, v: pd.Series, i: int) -> np.ndarray:
+    """Linearly interpolates (and extrapolates) between the "Stage" column and the given column of a stage table.
+    Shared by stg2sto() and stg2ar().
+
+    Args:
+        data_path (str): The path to the .csv file holding the stage table.
+        column (str): The column of the stage table to interpolate against the "Stage" column.
+        v (pd.Series): The values to interpolate.
+        i (int): 0 to get the values of the given column given stages, otherwise stages given values of the column.
+
+    Returns:
+        np.ndarray: The interpolated values.
+    """
     # NOTE: We Can use cubic interpolation instead of linear
-    x = stgar_data["Stage"]
-    y = stgar_data["Surf_Area"]
+    modified_time = os.path.getmtime(data_path)
     if i == 0:
-        # return surface area given stage
-        return interpolate.interp1d(
-            x, y, fill_value="extrapolate", kind="linear"
-        )(v)
+        x, y = _read_stage_table(data_path, modified_time, "Stage", column)
     else:
-        # return stage given surface area
-        return interpolate.interp1d(
-            y, x, fill_value="extrapolate", kind="linear"
-        )(v)
+        x, y = _read_stage_table(data_path, modified_time, column, "Stage")
+
+    v = np.asarray(v, dtype=np.float64)
+    # Extrapolate linearly from the first and last two points outside of the table
+    return np.where(
+        v < x[0],
+        y[0] + (v - x[0]) * (y[1] - y[0]) / (x[1] - x[0]),
+        np.where(
+            v > x[-1],
+            y[-1] + (v - x[-1]) * (y[-1] - y[-2]) / (x[-1] - x[-2]),
+            np.interp(v, x, y),
+        ),
+    )
 
 
-@retry(Exception, tries=3, delay=15, backoff=2)
+@retry(requests.exceptions.RequestException, tries=3, delay=15, backoff=2)
 def get_pi(workspace: str) -> None:
     # Weekly data is downloaded from:
     # https://www.ncei.noaa.gov/access/monitoring/weekly-palmers/pdi-0804.csv
     # State:Florida Division:4.South Central
-    df = pd.read_csv(
-        "https://www.ncei.noaa.gov/access/monitoring/weekly-palmers/pdi-0804.csv"
+    # Only failed requests are retried, anything else (e.g. unparsable data) fails right away.
+    response = requests.get(
+        "https://www.ncei.noaa.gov/access/monitoring/weekly-palmers/pdi-0804.csv",
+        timeout=60,
     )
+    response.raise_for_status()
+    # Parse the data so PI.csv keeps the row index column LOONE_DATA_PREP expects
+    df = pd.read_csv(io.BytesIO(response.content))
     df.to_csv(os.path.join(workspace, "PI.csv"))
 
 
@@ -962,6 +1001,40 @@ def dbhydro_data_is_latest(date_latest: str):
     )
 
 
+def parse_dbhydro_dates(dates: pd.Series) -> pd.Series:
+    """
+    Converts dbhydro dates in DD-MON-YYYY format (like 01-JAN-2024) to datetimes.
+    Splits the dates into their parts and maps the month abbreviations through a lookup table, which is faster than
+    parsing each date with the %d-%b-%Y format.
+
+    Args:
+        dates (pd.Series): The dates to convert, in DD-MON-YYYY format
+
+    Returns:
+        pd.Series: The converted dates
+    """
+    # Nothing to split (no dates, or dates that are already converted)
+    if dates.empty or not pd.api.types.is_string_dtype(dates):
+        return pd.to_datetime(dates)
+
+    # Dates that don't split into three parts can't be in DD-MON-YYYY format, the format parse reports them
+    date_parts = dates.str.split("-", n=2, expand=True)
+    if date_parts.shape[1] != 3:
+        return pd.to_datetime(dates, format="%d-%b-%Y")
+
+    try:
+        return pd.to_datetime(
+            {
+                "year": date_parts[2].astype(int),
+                "month": date_parts[1].str.upper().map(MONTH_NUMBERS).astype(int),
+                "day": date_parts[0].astype(int),
+            }
+        )
+    except (TypeError, ValueError):
+        # Missing or malformed dates. The format parse turns missing dates into NaT and reports the malformed ones.
+        return pd.to_datetime(dates, format="%d-%b-%Y")
+
+
 def get_synthetic_data(date_start: str, df: pd.DataFrame):
     """
     Gets 15 days of synthetic NO and Chla data matching forecast start date.
@@ -1,7 +1,10 @@
 import sys
 import os
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from loone_data_prep.water_level_data import hydro
 from loone_data_prep.flow_data.get_forecast_flows import get_stations_latitude_longitude
@@ -10,6 +13,23 @@ import pandas as pd
 
 DATE_NOW = datetime.now().date().strftime("%Y-%m-%d")
 
+# Number of NCAT conversion requests made at the same time
+NCAT_MAX_WORKERS = 16
+
+# Seconds to wait on an NCAT request before giving up on it
+NCAT_TIMEOUT = 10
+
+# Session reused for all NCAT requests so connections are kept alive and pooled (one connection per worker)
+_SESSION = requests.Session()
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=NCAT_MAX_WORKERS,
+        pool_maxsize=NCAT_MAX_WORKERS,
+        max_retries=Retry(total=3, backoff_factor=0.5),
+    ),
+)
+
 D = {
     "LO_Stage": {"dbkeys": ["16022", "12509", "12519", "16265", "15611"], "datum": "NGVD29"},
     "LO_Stage_2": {"dbkeys": ["94832"], "date_min": "2024-04-30", "datum": "NAVD88"},
@@ -54,20 +74,18 @@ def main(workspace: str, d: dict = D) -> dict:
                 hydro.get(workspace, name, dbkeys=params['dbkeys'], date_min=date_latest, date_max=DATE_NOW, datum=params['datum'])
                 
                 # Read in the original data and the newly downloaded data
-                df_original = pd.read_csv(os.path.join(workspace, original_file_name_temp), index_col=0)
-                df_new = pd.read_csv(os.path.join(workspace, original_file_name), index_col=0)
+                df_original = _read_water_level_file(os.path.join(workspace, original_file_name_temp))
+                df_new = _read_water_level_file(os.path.join(workspace, original_file_name))
                 
-                # For get_hydro() calls with multiple dbkeys, remove the row corresponding to the latest date from the downloaded data.
+                # Merge the new data with the original data.
+                # For get_hydro() calls with multiple dbkeys, the row corresponding to the latest date is downloaded again.
                 # When get_hydro() is given multiple keys its returned data starts from the date given instead of the day after like it
-                # does when given a single key.
-                if len(params['dbkeys']) > 1:
-                    df_new = df_new[df_new['date'] != date_latest]
-                
-                # Merge the new data with the original data
+                # does when given a single key. Keep the original row for that date.
                 df_merged = pd.concat([df_original, df_new], ignore_index=True)
+                df_merged.drop_duplicates(subset=['date'], keep='first', inplace=True)
                 
                 # Write out the merged data
-                df_merged.to_csv(os.path.join(workspace, original_file_name))
+                df_merged.to_csv(os.path.join(workspace, original_file_name), index=False)
                 
                 # Remove the original renamed data file
                 os.remove(os.path.join(workspace, original_file_name_temp))
@@ -98,57 +116,70 @@ def main(workspace: str, d: dict = D) -> dict:
         # Output Progress
         print("\nMerging data for station 'L OKEE'...")
         
-        # Get the latitude and longitude of the "L OKEE" station
-        lat_long_map = get_stations_latitude_longitude(["L OKEE"])
-        latitude, longitude = lat_long_map["L OKEE"]
-        
         # Load the LO_Stage_2.csv file
-        df_lo_stage_2 = pd.read_csv(os.path.join(workspace, "LO_Stage_2.csv"), index_col="date")
-        df_lo_stage_2.index = pd.to_datetime(df_lo_stage_2.index)
-        
-        # Output Progress
-        print("Converting NAVD88 to NGVD29 for 'L OKEE's new dbkey...\n")
+        df_lo_stage_2 = pd.read_csv(
+            os.path.join(workspace, "LO_Stage_2.csv"),
+            usecols=["date", "L OKEE_STG_ft NGVD29"],
+            dtype={"L OKEE_STG_ft NGVD29": "float64"},
+            parse_dates=["date"],
+            index_col="date",
+        )
         
         # Use only the data that is not already in the LO_Stage.csv file
         if date_latest_lo_stage_2 is not None:
             date_start = datetime.strptime(date_latest_lo_stage_2, "%Y-%m-%d") + pd.DateOffset(days=1)
             df_lo_stage_2 = df_lo_stage_2.loc[date_start:]
         
-        # Convert the stage values from NAVD88 to NGVD29
-        lo_stage_2_dates = df_lo_stage_2.index.tolist()
-        lo_stage_2_values_navd88 = df_lo_stage_2["L OKEE_STG_ft NGVD29"].tolist()
-        lo_stage_2_values_ngvd29 = []
+        # Skip the conversion (and the NCAT requests) when there is no new data
+        if df_lo_stage_2.empty:
+            print("No new data to convert for 'L OKEE'.")
+        else:
+            # Get the latitude and longitude of the "L OKEE" station
+            lat_long_map = get_stations_latitude_longitude(["L OKEE"])
+            latitude, longitude = lat_long_map["L OKEE"]
         
-        for i in range(0, len(lo_stage_2_values_navd88)):
-            date = lo_stage_2_dates[i]
-            value = lo_stage_2_values_navd88[i]
-            try:
-                lo_stage_2_values_ngvd29.append(_convert_navd88_to_ngvd29(latitude, longitude, value, date.year))
-            except Exception as e:
-                convert_failure = True
-                print(str(e))
-                break
+            # Output Progress
+            print("Converting NAVD88 to NGVD29 for 'L OKEE's new dbkey...\n")
         
-        # Check for conversion failure
-        if not convert_failure:        
-            # Update the LO_Stage.csv file with the converted values
-            df_lo_stage = pd.read_csv(os.path.join(workspace, "LO_Stage.csv"), index_col="date")
-            df_lo_stage.index = pd.to_datetime(df_lo_stage.index)
+            # Convert the stage values from NAVD88 to NGVD29
+            lo_stage_2_dates = df_lo_stage_2.index.tolist()
+            lo_stage_2_values_navd88 = df_lo_stage_2["L OKEE_STG_ft NGVD29"].tolist()
+            lo_stage_2_values_ngvd29 = []
+        
+            # Each value is converted with its own NCAT request, so the requests are made concurrently
+            with ThreadPoolExecutor(max_workers=NCAT_MAX_WORKERS) as executor:
+                futures = [
+                    executor.submit(_convert_navd88_to_ngvd29, latitude, longitude, value, date.year)
+                    for date, value in zip(lo_stage_2_dates, lo_stage_2_values_navd88)
+                ]
             
-            for i in range(0, len(lo_stage_2_values_ngvd29)):
-                # Get the current date and value
-                date = lo_stage_2_dates[i]
-                value = lo_stage_2_values_ngvd29[i]
-                
-                # Update the value in the LO_Stage dataframe
-                df_lo_stage.at[date, "L OKEE_STG_ft NGVD29"] = value
+                for future in futures:
+                    try:
+                        lo_stage_2_values_ngvd29.append(future.result())
+                    except Exception as e:
+                        convert_failure = True
+                        print(str(e))
+                        # Don't wait on requests that haven't started yet
+                        executor.shutdown(wait=False, cancel_futures=True)
+                        break
+        
+            # Check for conversion failure
+            if not convert_failure:        
+                # Update the LO_Stage.csv file with the converted values
+                df_lo_stage = _read_water_level_file(os.path.join(workspace, "LO_Stage.csv"))
+                df_lo_stage["date"] = pd.to_datetime(df_lo_stage["date"])
+                df_lo_stage.set_index("date", inplace=True)
             
-            # Reset the index
-            df_lo_stage.reset_index(inplace=True)
-            df_lo_stage.drop(columns=["Unnamed: 0"], inplace=True)
+                for i in range(0, len(lo_stage_2_values_ngvd29)):
+                    # Get the current date and value
+                    date = lo_stage_2_dates[i]
+                    value = lo_stage_2_values_ngvd29[i]
+                
+                    # Update the value in the LO_Stage dataframe
+                    df_lo_stage.at[date, "L OKEE_STG_ft NGVD29"] = value
             
-            # Save the updated LO_Stage.csv file
-            df_lo_stage.to_csv(os.path.join(workspace, "LO_Stage.csv"))
+                # Save the updated LO_Stage.csv file
+                df_lo_stage.to_csv(os.path.join(workspace, "LO_Stage.csv"))
     else:
         # Conversion failed due to missing files
         convert_failure = True
@@ -170,6 +201,19 @@ def main(workspace: str, d: dict = D) -> dict:
     
     return {"success": "Completed water level data download."}
 
+def _read_water_level_file(path: str) -> pd.DataFrame:
+    """Reads a water level data file. Files written before the row index was dropped from them have it as an unnamed
+    column, which is removed.
+    
+    Args:
+        path (str): The path to the .csv file.
+        
+    Returns:
+        pd.DataFrame: The water level data, with a 'date' column.
+    """
+    df = pd.read_csv(path)
+    return df.drop(columns=[column for column in df.columns if column.startswith('Unnamed')])
+
 def _convert_navd88_to_ngvd29(latitude: float, longitude: float, stage: float, year: int) -> float:
     """Converts a stage value from NAVD88 to NGVD29 using NCAT.
     
@@ -211,7 +255,7 @@ def _convert_navd88_to_ngvd29(latitude: float, longitude: float, stage: float, y
     }
     
     try:
-        response = requests.get(base_url, params=params)
+        response = _SESSION.get(base_url, params=params, timeout=NCAT_TIMEOUT)
     except Exception as e:
         raise Exception(f"Error converting NAVD88 to NGVD29: {e}")
     
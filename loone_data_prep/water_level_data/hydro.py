@@ -97,7 +97,7 @@ def _reformat_water_level_file(workspace: str, name: str):
     df.dropna(how='all', inplace=True)
     
     # Write the updated data back to the file
-    df.to_csv(f"{workspace}/{name}.csv")
+    df.to_csv(f"{workspace}/{name}.csv", index=False)
 
 if __name__ == "__main__":
     args = [sys.argv[1].rstrip("/"), sys.argv[2]]
@@ -1,6 +1,6 @@
 import sys
 import os
-import uuid
+import tempfile
 from datetime import datetime, timedelta
 import pandas as pd
 from loone_data_prep.water_quality_data import wq
@@ -41,24 +41,33 @@ def main(workspace: str, d: dict = D) -> dict:
         for station_id in params["station_ids"]:
             station_date_latest[station_id] = find_last_date_in_csv(workspace, f"water_quality_{station_id}_{name}.csv")
         
+        # Station IDs that don't have any data yet. All of their data is downloaded with a single call.
+        station_ids_download_all = []
+        
         # Get the water quality data
         for station_id, date_latest in station_date_latest.items():
             # File with data for this station/name combination does NOT already exist (or possibly some other error occurred)
             if date_latest is None:
                 # Get all the water quality data for the name/station combination
                 print(f"Getting all {name} data for station ID: {station_id}.")
-                wq.get(workspace, name, [station_id])
+                station_ids_download_all.append(station_id)
             else:
                 # Check whether we already have the latest data
                 if dbhydro_data_is_latest(date_latest):
                     # Notify that the data is already up to date
-                    print(f'Downloading of new water quality data for test name: {name} station: {station} skipped. Data is already up to date.')
+                    print(f'Downloading of new water quality data for test name: {name} station: {station_id} skipped. Data is already up to date.')
                     continue
                 
                 # Temporarily rename current data file so it isn't over written
                 original_file_name = f"water_quality_{station_id}_{name}.csv"
-                original_file_name_temp = f"water_quality_{station_id}_{name}_{uuid.uuid4()}.csv"
-                os.rename(os.path.join(workspace, original_file_name), os.path.join(workspace, original_file_name_temp))
+                file_descriptor, original_file_path_temp = tempfile.mkstemp(
+                    suffix=".csv",
+                    prefix=f"water_quality_{station_id}_{name}_",
+                    dir=workspace,
+                )
+                os.close(file_descriptor)
+                original_file_name_temp = os.path.basename(original_file_path_temp)
+                os.replace(os.path.join(workspace, original_file_name), original_file_path_temp)
                 
                 try:
                     # Get only the water quality data that is newer than the latest data in the csv file
@@ -70,25 +79,39 @@ def main(workspace: str, d: dict = D) -> dict:
                     if not os.path.exists(os.path.join(workspace, original_file_name)):
                         raise Exception(f"It's possible that the data for test name: {name} station ID: {station_id} has reached its end date.")
                     
-                    # Read in the original data
-                    df_original = pd.read_csv(os.path.join(workspace, original_file_name_temp), index_col=0)
+                    # Read in the columns and the dates of the original data (the rest of it is only appended to)
+                    original_columns = pd.read_csv(original_file_path_temp, index_col=0, nrows=0).columns
+                    df_original = pd.read_csv(
+                        original_file_path_temp,
+                        usecols=[0, original_columns.get_loc('date') + 1],
+                        index_col=0,
+                    )
                     
                     # Calculate the days column for the newly downloaded data
                     df_original_date_min = df_original['date'].min()
                     wq._calculate_days_column(workspace, original_file_name, df_original_date_min)
                     
-                    # Read in the newly downloaded data
-                    df_new = pd.read_csv(os.path.join(workspace, original_file_name), index_col=0)
-                    df_new.reset_index(inplace=True)
-                    
-                    # Merge the new data with the original data
-                    df_merged = pd.concat([df_original, df_new], ignore_index=True)
+                    # Read in the newly downloaded data (_calculate_days_column writes it without a row number column)
+                    df_new = pd.read_csv(os.path.join(workspace, original_file_name))
                     
-                    # Write out the merged data
-                    df_merged.to_csv(os.path.join(workspace, original_file_name))
-                    
-                    # Remove the original renamed data file
-                    os.remove(os.path.join(workspace, original_file_name_temp))
+                    if set(df_new.columns) - set(original_columns):
+                        # The new data has columns the original data doesn't (ex: the units of a test changed).
+                        # Merge it with all of the original data so those columns are kept.
+                        df_original = pd.read_csv(original_file_path_temp, index_col=0)
+                        df_merged = pd.concat([df_original, df_new], ignore_index=True)
+                        
+                        # Write out the merged data and remove the original renamed data file
+                        df_merged.to_csv(os.path.join(workspace, original_file_name))
+                        os.remove(original_file_path_temp)
+                    else:
+                        # Put the new data in the same column order as the original data and continue its row numbers
+                        df_new = df_new.reindex(columns=original_columns)
+                        index_start = df_original.index.max() + 1
+                        df_new.index = pd.RangeIndex(index_start, index_start + len(df_new))
+                        
+                        # Append the new data to the original data and move it back in place of the downloaded file
+                        df_new.to_csv(original_file_path_temp, mode='a', header=False)
+                        os.replace(original_file_path_temp, os.path.join(workspace, original_file_name))
                 except Exception as e:
                     # Notify of the error
                     print(f"Error occurred while downloading new water quality data: {e}")
@@ -99,11 +122,15 @@ def main(workspace: str, d: dict = D) -> dict:
                     
                     # Rename the original renamed file back to its original name
                     if os.path.exists(os.path.join(workspace, original_file_name_temp)):
-                        os.rename(os.path.join(workspace, original_file_name_temp), os.path.join(workspace, original_file_name))
+                        os.replace(os.path.join(workspace, original_file_name_temp), os.path.join(workspace, original_file_name))
                     
                     # Add the file name to the list of failed downloads
                     failed_downloads.append(original_file_name)
         
+        # Download all of the data for the station IDs that don't have any yet
+        if station_ids_download_all:
+            wq.get(workspace, name, station_ids_download_all)
+        
         # Check for missing files
         for station in params["station_ids"]:
             if not os.path.exists(os.path.join(workspace, f"water_quality_{station}_{name}.csv")):
@@ -1,7 +1,9 @@
 import sys
 from datetime import datetime
+from functools import lru_cache
 from retry import retry
 from rpy2.robjects import r
+from rpy2.robjects.vectors import StrVector
 from rpy2.rinterface_lib.embedded import RRuntimeError
 
 
@@ -9,6 +11,59 @@ DEFAULT_STATION_IDS = ["L001", "L004", "L005", "L006", "L007", "L008", "LZ40"]
 DATE_NOW = datetime.now().strftime("%Y-%m-%d")
 
 
+@lru_cache(maxsize=1)
+def _define_r_download_water_quality() -> None:
+    """Defines the R download_water_quality() function used by get().
+    The definition (and loading of the R libraries) only needs to happen once per R session, so it is cached.
+    """
+    r(
+        """
+        # Load the required libraries
+        library(rio)
+        library(dbhydroR)
+
+        download_water_quality <- function(workspace, station_ids, date_min, date_max, test_names)
+        {
+            # Loop over the station IDs
+            for (station_id in station_ids) {
+                # Retrieve water quality data for the current station ID
+                water_quality_data <- tryCatch(
+                    get_wq(
+                        station_id = station_id,
+                        date_min = date_min,
+                        date_max = date_max,
+                        test_name = test_names
+                    ),
+                    error = function(e) NULL
+                )
+
+                # Check if data is available for the current station ID and test name
+                if (!is.null(water_quality_data) && nrow(water_quality_data) > 0) {
+                    # Convert the vector to a data frame
+                    water_quality_data <- as.data.frame(water_quality_data)
+
+                    # Calculate the number of days from the minimum date plus 8
+                    water_quality_data$days <- as.integer(difftime(water_quality_data$date, min(water_quality_data$date), units = "days")) + as.integer(format(min(water_quality_data$date), "%d"))
+
+                    # Generate the filename based on the station ID
+                    filename <- paste0(workspace, "/water_quality_", station_id, "_", test_names, ".csv")
+
+                    # Save data to a CSV file
+                    write.csv(water_quality_data, file = filename)
+
+                    # Print a message indicating the file has been saved
+                    cat("CSV file", filename, "has been saved.\n")
+                } else {
+                    # Print a message indicating no data was found for the current station ID and test name
+                    cat("No data found for station ID", station_id, "and test name", test_names, "\n")
+                }
+                Sys.sleep(1) # Wait for 1 seconds before the next iteration
+            }
+        }
+        """  # noqa: E501
+    )
+
+
 @retry(RRuntimeError, tries=5, delay=15, max_delay=60, backoff=2)
 def get(
     workspace: str,
@@ -18,56 +73,10 @@ def get(
     date_max: str = DATE_NOW,
     **kwargs: str | list
 ) -> None:
-    station_ids_str = "\"" + "\", \"".join(station_ids) + "\""
-    r(
-        f"""
-        # Load the required libraries
-        library(rio)
-        library(dbhydroR)
+    # Define the R function used to download the data (only done once per session)
+    _define_r_download_water_quality()
 
-        # Specify the station IDs, date range, and test names
-        station_ids <- c({station_ids_str})
-        date_min <- "{date_min}"
-        date_max <- "{date_max}"
-        test_names <- c("{name}")
-
-        # Loop over the station IDs
-        for (station_id in station_ids) {{
-            # Retrieve water quality data for the current station ID
-            water_quality_data <- tryCatch(
-                get_wq(
-                    station_id = station_id,
-                    date_min = date_min,
-                    date_max = date_max,
-                    test_name = test_names
-                ),
-                error = function(e) NULL
-            )
-
-            # Check if data is available for the current station ID and test name
-            if (!is.null(water_quality_data) && nrow(water_quality_data) > 0) {{
-                # Convert the vector to a data frame
-                water_quality_data <- as.data.frame(water_quality_data)
-
-                # Calculate the number of days from the minimum date plus 8
-                water_quality_data$days <- as.integer(difftime(water_quality_data$date, min(water_quality_data$date), units = "days")) + as.integer(format(min(water_quality_data$date), "%d"))
-
-                # Generate the filename based on the station ID
-                filename <- paste0("{workspace}/water_quality_", station_id, "_", test_names, ".csv")
-
-                # Save data to a CSV file
-                write.csv(water_quality_data, file = filename)
-
-                # Print a message indicating the file has been saved
-                cat("CSV file", filename, "has been saved.\n")
-            }} else {{
-                # Print a message indicating no data was found for the current station ID and test name
-                cat("No data found for station ID", station_id, "and test name", test_names, "\n")
-            }}
-            Sys.sleep(1) # Wait for 1 seconds before the next iteration
-        }}
-        """  # noqa: E501
-    )
+    r.download_water_quality(workspace, StrVector(station_ids), date_min, date_max, name)
 
 
 def _calculate_days_column(workspace: str, file_name: str, date_min: str):
@@ -96,18 +105,19 @@ def _calculate_days_column(workspace: str, file_name: str, date_min: str):
         date_min_tz <- format(with_tz(date_min_object, tzone = "America/New_York"), "%Z")
         date_min_object <- as.POSIXct("{date_min}", tz = date_min_tz)
         
-        # Calculate each value in the days column based on the date_min
-        for(i in 1:nrow(df)) 
+        # Get each row's date as an object with the correct timezone.
+        # as.POSIXct() only takes a single timezone, so the dates are converted once per distinct timezone (EST/EDT).
+        dates <- as.POSIXct(df$date, tz = "UTC")
+        dates_tz <- format(with_tz(dates, tzone = "America/New_York"), "%Z")
+        for (date_tz in unique(dates_tz[!is.na(dates_tz)]))
         {{
-            # Get the current row's date as an object with the correct timezone
-            date <- as.POSIXct(df$date[i], tz = "UTC")
-            date_tz <- format(with_tz(date, tzone = "America/New_York"), "%Z")
-            date <- as.POSIXct(df$date[i], tz = date_tz)
-            
-            # Calculate the number of days from the minimum date to the row's date plus the number of days in date_min
-            df$days[i] <- as.integer(difftime(date, date_min_object, units = "days")) + as.integer(format(date_min_object, "%d"))
+            rows <- which(dates_tz == date_tz)
+            dates[rows] <- as.POSIXct(df$date[rows], tz = date_tz)
         }}
         
+        # Calculate the number of days from the minimum date to each row's date plus the number of days in date_min
+        df$days <- as.integer(difftime(dates, date_min_object, units = "days")) + as.integer(format(date_min_object, "%d"))
+        
         # Write the updated data frame back to the CSV file
         write.csv(df, file = "{workspace}/{file_name}", row.names = FALSE)
         """ # noqa: E501
@@ -3,14 +3,27 @@ from datetime import datetime
 from retry import retry
 from rpy2.robjects import r
 from rpy2.rinterface_lib.embedded import RRuntimeError
+import numpy as np
 import pandas as pd
 
 
 DEFAULT_DBKEYS = ["16021", "12515", "12524", "13081"]
+DEFAULT_STATION_IDS = ["L001", "L005", "L006", "LZ40"]
 DATE_NOW = datetime.now().strftime("%Y-%m-%d")
 
+# Units for the file name and column header of each type of data
+DATA_UNITS = {
+    "RAIN": ("Inches", "Inches"),
+    "ETPI": ("Inches", "Inches"),
+    "H2OT": ("Degrees Celsius", "Degrees Celsius"),
+    "RADP": ("", "MICROMOLE/m^2/s"),
+    "RADT": ("", "kW/m^2"),
+    "AIRT": ("Degrees Celsius", "Degrees Celsius"),
+    "WNDS": ("MPH", "MPH"),
+}
 
-@retry(RRuntimeError, tries=5, delay=15, max_delay=60, backoff=2)
+
+@retry(RRuntimeError, tries=5, delay=15, max_delay=60, backoff=2, jitter=(0, 15))
 def get(
     workspace: str,
     param: str,
@@ -39,6 +52,16 @@ def get(
             
             for (i in dbkeys) 
             {{
+                # Add a delay between requests (at least 2 seconds between the start of each request).
+                # The start of the last request is kept in the global environment so the delay also holds across calls
+                # made with a single dbkey each.
+                if (exists("weather_last_request_start", envir = globalenv()))
+                {{
+                    request_elapsed <- proc.time()[["elapsed"]] - get("weather_last_request_start", envir = globalenv())
+                    Sys.sleep(max(0, 2 - request_elapsed))
+                }}
+                assign("weather_last_request_start", proc.time()[["elapsed"]], envir = globalenv())
+                
                 # Retrieve data for the dbkey
                 data <- get_hydro(dbkey = i, date_min = "{date_min}", date_max = "{date_max}", raw = TRUE)
                 
@@ -59,6 +82,22 @@ def get(
                     # Clean the data.frame
                     data <- clean_hydro(data)
                     
+                    # Reformat the data.frame to the layout expected by the rest of the LOONE scripts
+                    # Remove the unneeded column
+                    data[[" _{data_type}_{data_units_header}"]] <- NULL
+                    
+                    # Convert the date column (DD-MON-YYYY) to dates and sort the data by date
+                    # The month is matched against month.abb so the parse doesn't depend on the locale, like %b does
+                    date_day <- as.integer(substr(data$date, 1, 2))
+                    date_month <- match(toupper(substr(data$date, 4, 6)), toupper(month.abb))
+                    date_year <- as.integer(substr(data$date, 8, 11))
+                    data$date <- as.Date(ISOdate(date_year, date_month, date_day))
+                    data <- data[order(data$date), ]
+                    
+                    # Drop rows that are missing all their values and renumber the rows
+                    data <- data[rowSums(!is.na(data)) > 0, ]
+                    rownames(data) <- NULL
+                    
                     # Get the filename of the output file
                     filename <- ""
                     
@@ -74,8 +113,8 @@ def get(
                     filename <- paste0(filename, ".csv")
                     filename <- paste0("{workspace}/", filename)
 
-                    # Save data to a CSV file
-                    write.csv(data, file = filename)
+                    # Save data to a CSV file (unquoted so the dates can be read back by find_last_date_in_csv)
+                    write.csv(data, file = filename, quote = FALSE)
 
                     # Print a message indicating the file has been saved
                     cat("CSV file", filename, "has been saved.\n")
@@ -88,9 +127,6 @@ def get(
                     # No data given back, It's possible that the dbkey has reached its end date.
                     print(paste("Empty data.frame returned for dbkey", i, "It's possible that the dbkey has reached its end date. Skipping to the next dbkey."))
                 }}
-
-                # Add a delay between requests
-                Sys.sleep(2) # Wait for 2 seconds before the next iteration
             }}
             
             # Return the station and dbkey to the python code
@@ -100,20 +136,7 @@ def get(
     
     # Download the weather data
     r(r_str)
-    result = r.download_weather_data()
-    
-    # Get the stations of the dbkeys who's data were successfully downloaded
-    stations = []
-    for value in result:
-        stations.append(value[0])
-    
-    # Format files to expected layout
-    for station in stations:
-        if station in ["L001", "L005", "L006", "LZ40"]:
-            _reformat_weather_file(workspace, station, data_type, data_units_file, data_units_header)
-            
-            # Print a message indicating the file has been saved
-            print(f"CSV file {workspace}/{station}_{data_type}_{data_units_file}.csv has been reformatted.")
+    r.download_weather_data()
 
 
 def merge_data(workspace: str, data_type: str):
@@ -127,103 +150,63 @@ def merge_data(workspace: str, data_type: str):
     
     # Merge the data files for the different stations (LAKE_RAINFALL_DATA.csv)
     if data_type == "RAIN":
-        r(
-            f"""
-            L001_RAIN_Inches <- read.csv("{workspace}/L001_RAIN_Inches.csv", colClasses = c("NULL", "character", "numeric"))
-            L005_RAIN_Inches = read.csv("{workspace}/L005_RAIN_Inches.csv", colClasses = c("NULL", "character", "numeric"))
-            L006_RAIN_Inches = read.csv("{workspace}/L006_RAIN_Inches.csv", colClasses = c("NULL", "character", "numeric"))
-            LZ40_RAIN_Inches = read.csv("{workspace}/LZ40_RAIN_Inches.csv", colClasses = c("NULL", "character", "numeric"))
-            #Replace NA values with zero
-            L001_RAIN_Inches[is.na(L001_RAIN_Inches)] <- 0
-            L005_RAIN_Inches[is.na(L005_RAIN_Inches)] <- 0
-            L006_RAIN_Inches[is.na(L006_RAIN_Inches)] <- 0
-            LZ40_RAIN_Inches[is.na(LZ40_RAIN_Inches)] <- 0
-            # Merge the files by the "date" column
-            merged_data <- merge(L001_RAIN_Inches, L005_RAIN_Inches, by = "date",all = TRUE)
-            merged_data <- merge(merged_data, L006_RAIN_Inches, by = "date",all = TRUE)
-            merged_data <- merge(merged_data, LZ40_RAIN_Inches, by = "date",all = TRUE)
-            # Calculate the average rainfall per day
-            merged_data$average_rainfall <- rowMeans(merged_data[, -1],na.rm = TRUE)
-
-            # View the updated merged data
-            head(merged_data)
-            # Save merged data as a CSV file
-            write.csv(merged_data, "{workspace}/LAKE_RAINFALL_DATA.csv", row.names = TRUE)
-            """  # noqa: E501
-        )
+        _merge_station_files(workspace, data_type, "average_rainfall", "LAKE_RAINFALL_DATA.csv")
 
     # Merge the data files for the different stations (LOONE_AVERAGE_ETPI_DATA.csv)
     if data_type == "ETPI":
-        r(
-            f"""
-            L001_ETPI_Inches <- read.csv("{workspace}/L001_ETPI_Inches.csv", colClasses = c("NULL", "character", "numeric"))
-            L005_ETPI_Inches = read.csv("{workspace}/L005_ETPI_Inches.csv", colClasses = c("NULL", "character", "numeric"))
-            L006_ETPI_Inches = read.csv("{workspace}/L006_ETPI_Inches.csv", colClasses = c("NULL", "character", "numeric"))
-            LZ40_ETPI_Inches = read.csv("{workspace}/LZ40_ETPI_Inches.csv", colClasses = c("NULL", "character", "numeric"))
-
-            # Replace NA values with zero
-            L001_ETPI_Inches[is.na(L001_ETPI_Inches)] <- 0
-            L005_ETPI_Inches[is.na(L005_ETPI_Inches)] <- 0
-            L006_ETPI_Inches[is.na(L006_ETPI_Inches)] <- 0
-            LZ40_ETPI_Inches[is.na(LZ40_ETPI_Inches)] <- 0
-            # Merge the files by the "date" column
-            merged_data <- merge(L001_ETPI_Inches, L005_ETPI_Inches, by = "date",all = TRUE)
-            merged_data <- merge(merged_data, L006_ETPI_Inches, by = "date",all = TRUE)
-            merged_data <- merge(merged_data, LZ40_ETPI_Inches, by = "date",all = TRUE)
-            # Calculate the average rainfall per day
-            merged_data$average_ETPI <- rowMeans(merged_data[, -1],na.rm = TRUE)
-
-            # View the updated merged data
-            head(merged_data)
-            # Save merged data as a CSV file
-            write.csv(merged_data, "{workspace}/LOONE_AVERAGE_ETPI_DATA.csv", row.names = TRUE)
-            """  # noqa: E501
-        )
+        _merge_station_files(workspace, data_type, "average_ETPI", "LOONE_AVERAGE_ETPI_DATA.csv")
 
 
-def _reformat_weather_file(workspace: str, station: str, data_type: str, data_units_file: str, data_units_header: str) -> None:
-    '''
-    Reformats the dbhydro weather file to the layout expected by the rest of the LOONE scripts.
-    This function reads in and writes out a .csv file.
+def _merge_station_files(
+    workspace: str,
+    data_type: str,
+    average_column: str,
+    file_name: str,
+    station_ids: list = DEFAULT_STATION_IDS,
+) -> None:
+    """
+    Merges the data files of the given stations on their dates and adds a column with the average value of each day.
+    NA values in the station files are replaced with zero before the merge.
     
     Args:
         workspace (str): The path to the workspace directory.
-        station (str): The station name. Ex: L001, L005, L006, LZ40.
-        data_type (str): The type of data. Ex: RAIN, ETPI, H2OT, RADP, RADT, AIRT, WNDS.
-        data_units_file (str): The units for the file name. Ex: Inches, Degrees Celsius, etc.
-        data_units_header (str): The units for the column header. Ex: Inches, Degrees Celsius, etc. Can differ from data_units_file when data_type is either RADP or RADT.
+        data_type (str): The type of data. Ex: RAIN, ETPI.
+        average_column (str): The name of the column holding the average of the stations. Ex: average_rainfall.
+        file_name (str): The name of the merged .csv file to write. Ex: LAKE_RAINFALL_DATA.csv.
+        station_ids (list): The stations whose data files are merged. Defaults to DEFAULT_STATION_IDS.
         
     Returns:
         None
-    '''
-    # Read in the data
-    df = None
-    if data_type in ['RADP', 'RADT']:
-        df = pd.read_csv(f"{workspace}/{station}_{data_type}.csv")
-    else:
-        df = pd.read_csv(f"{workspace}/{station}_{data_type}_{data_units_file}.csv")
-    
-    # Remove unneeded column columns
-    df.drop(f' _{data_type}_{data_units_header}', axis=1, inplace=True)
-    df.drop('Unnamed: 0', axis=1, inplace=True)
-    
-    # Convert date column to datetime
-    df['date'] = pd.to_datetime(df['date'], format='%d-%b-%Y')
+    """
+    data_units_file, _ = _get_file_header_data_units(data_type)
     
-    # Sort the data by date
-    df.sort_values('date', inplace=True)
+    # Read in the data for each station, replacing NA values with zero
+    station_data = []
+    for station in station_ids:
+        column = f"{station}_{data_type}_{data_units_file}"
+        df = pd.read_csv(
+            f"{workspace}/{column}.csv",
+            usecols=["date", column],
+            dtype={column: "float64"},
+            index_col="date",
+        )
+        
+        # Each date has to be unique so the stations can be aligned on it
+        if df.index.has_duplicates:
+            raise ValueError(f"{column}.csv has more than one row for some dates.")
+        
+        station_data.append(df.fillna(0))
     
-    # Renumber the index
-    df.reset_index(drop=True, inplace=True)
+    # Merge the data by the "date" column (all stations are aligned in a single pass)
+    merged_data = pd.concat(station_data, axis=1, join="outer").sort_index()
     
-    # Drop rows that are missing all their values
-    df.dropna(how='all', inplace=True)
+    # Calculate the average value per day
+    merged_data[average_column] = np.nanmean(merged_data.to_numpy(dtype=np.float64), axis=1)
     
-    # Write the updated data back to the file
-    if data_type in ['RADP', 'RADT']:
-        df.to_csv(f"{workspace}/{station}_{data_type}.csv")
-    else:
-        df.to_csv(f"{workspace}/{station}_{data_type}_{data_units_file}.csv")
+    # Save merged data as a CSV file (rows are numbered from 1 and missing values written as NA, like write.csv)
+    merged_data.reset_index(inplace=True)
+    merged_data.index = merged_data.index + 1
+    merged_data.to_csv(f"{workspace}/{file_name}", na_rep="NA")
 
 
 def _get_file_header_data_units(data_type: str) -> tuple[str, str]:
@@ -240,28 +223,8 @@ def _get_file_header_data_units(data_type: str) -> tuple[str, str]:
         tuple[str, str]: A tuple containing two strings. The first string represents the unit of measurement for the file name, and the second string represents the unit of measurement for the column header in the data file.
     """
     # Get the units for the file name and column header based on the type of data
-    if data_type == "RAIN":
-        data_units_file = "Inches"
-        data_units_header = "Inches"
-    elif data_type == "ETPI":
-        data_units_file = "Inches"
-        data_units_header = "Inches"
-    elif data_type == "H2OT":
-        data_units_file = "Degrees Celsius"
-        data_units_header = "Degrees Celsius"
-    elif data_type == "RADP":
-        data_units_file = ""
-        data_units_header = "MICROMOLE/m^2/s"
-    elif data_type == "RADT":
-        data_units_file = ""
-        data_units_header = "kW/m^2"
-    elif data_type == "AIRT":
-        data_units_file = "Degrees Celsius"
-        data_units_header = "Degrees Celsius"
-    elif data_type == "WNDS":
-        data_units_file = "MPH"
-        data_units_header = "MPH"
-        
+    data_units_file, data_units_header = DATA_UNITS[data_type]
+    
     return data_units_file, data_units_header
 
 